@@ -0,0 +1,84 @@
+"""
+Response helpers for Virtual Human API
+"""
+
+import logging
+from types import MappingProxyType
+from typing import Any, Union
+
+import orjson
+from fastapi import Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+# Shared orjson options: numpy arrays/scalars and non-str dict keys encode natively
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _json_default(obj: Any) -> Any:
+    """Fallback for types orjson doesn't handle natively"""
+    if isinstance(obj, MappingProxyType):
+        # Read-only constants shared by the services
+        return dict(obj)
+    return str(obj)
+
+
+def json_dumps(data: Any) -> bytes:
+    """Serialize data to JSON bytes with the shared orjson options"""
+    return orjson.dumps(data, default=_json_default, option=ORJSON_OPTIONS)
+
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib encoder"""
+    
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+def make_json_response(data: Any, status: int = 200) -> Response:
+    """Serialize data once with orjson, bypassing FastAPI's jsonable_encoder"""
+    return Response(json_dumps(data), status_code=status, media_type="application/json")
+
+
+async def receive_frame(websocket: WebSocket) -> Union[bytes, str]:
+    """Receive one WebSocket frame as-is, binary or text, without re-encoding it"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("bytes")
+    return data if data is not None else message["text"]
+
+
+class ErrorResponseMiddleware:
+    """Turn unhandled HTTP route errors into a JSON 500 with the error message
+    
+    Registered inside CORSMiddleware, so these responses still carry the CORS headers.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response_started = False
+        
+        async def send_wrapper(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # A response that is already under way can't be replaced; let the server handle it
+            if response_started:
+                raise
+            logger.exception(f"Error handling {scope['method']} {scope['path']}: {exc}")
+            await ORJSONResponse({"detail": str(exc)}, status_code=500)(scope, receive, send)
\ No newline at end of file
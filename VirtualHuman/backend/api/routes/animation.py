@@ -3,110 +3,146 @@ Animation API routes for Virtual Human
 """
 
 from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from typing import Dict, Any, Optional
-import json
+from pydantic import BaseModel
+from typing import Dict, Any, Optional, List, Union
+import asyncio
 import logging
+import msgspec
+import orjson
 
+from api.responses import json_dumps, make_json_response, receive_frame
 from core.animation_service import AnimationService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Clients that offer this subprotocol talk MessagePack (application/x-msgpack) instead of JSON
+MSGPACK_SUBPROTOCOL = "msgpack"
+_msgpack_encoder = msgspec.msgpack.Encoder()
+_msgpack_decoder = msgspec.msgpack.Decoder()
+
+class AnimationUpdateRequest(BaseModel):
+    """Animation update request model"""
+    type: str = ""
+    parameters: Dict[str, Any] = {}
+
+class BlendshapeRequest(BaseModel):
+    """Blendshape request model, keyed by name or in ARKit order"""
+    blendshapes: Union[Dict[str, float], List[float]] = {}
+    duration: float = 1.0
+
+class GestureRequest(BaseModel):
+    """Gesture request model"""
+    gesture: str = ""
+    intensity: float = 1.0
+
+# Incoming frames are answered in batches, one flush per interval (~60 Hz). Each reply frame is an
+# array holding one create_complete_animation result per request frame received since the last flush,
+# in arrival order (a JSON text frame, or a MessagePack binary frame for "msgpack" clients). A failure
+# that ends the connection is reported as a single {"error": ...} object.
+BATCH_INTERVAL = 0.016
+BATCH_QUEUE_SIZE = 32
+
 @router.post("/update")
-async def update_animation(animation_data: Dict[str, Any]):
+async def update_animation(animation_data: AnimationUpdateRequest):
     """Update avatar animation"""
-    try:
-        animation_type = animation_data.get("type", "")
-        parameters = animation_data.get("parameters", {})
-        
-        if not animation_type:
-            raise HTTPException(status_code=400, detail="Animation type is required")
-        
-        # Create animation
-        result = await AnimationService.create_complete_animation(animation_type, parameters)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error updating animation: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    animation_type = animation_data.type
+    parameters = animation_data.parameters
+    
+    if not animation_type:
+        raise HTTPException(status_code=400, detail="Animation type is required")
+    
+    # Create animation
+    result = await AnimationService.create_complete_animation(animation_type, parameters)
+    
+    return result
 
 @router.post("/blendshapes")
-async def update_blendshapes(blendshape_data: Dict[str, Any]):
+async def update_blendshapes(blendshape_data: BlendshapeRequest):
     """Update facial blendshapes"""
-    try:
-        blendshapes = blendshape_data.get("blendshapes", {})
-        duration = blendshape_data.get("duration", 1.0)
-        
-        if not blendshapes:
-            raise HTTPException(status_code=400, detail="Blendshapes are required")
-        
-        # Create blendshape animation
-        result = await AnimationService.create_blendshape_animation(blendshapes, duration)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error updating blendshapes: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    blendshapes = blendshape_data.blendshapes
+    duration = blendshape_data.duration
+    
+    if not blendshapes:
+        raise HTTPException(status_code=400, detail="Blendshapes are required")
+    
+    # Create blendshape animation
+    result = await AnimationService.create_blendshape_animation(blendshapes, duration)
+    
+    return result
 
 @router.post("/gesture")
-async def trigger_gesture(gesture_data: Dict[str, Any]):
+async def trigger_gesture(gesture_data: GestureRequest):
     """Trigger a specific gesture"""
-    try:
-        gesture_type = gesture_data.get("gesture", "")
-        intensity = gesture_data.get("intensity", 1.0)
-        
-        if not gesture_type:
-            raise HTTPException(status_code=400, detail="Gesture type is required")
-        
-        # Trigger gesture
-        result = await AnimationService.trigger_gesture(gesture_type, gesture_data)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error triggering gesture: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    gesture_type = gesture_data.gesture
+    
+    if not gesture_type:
+        raise HTTPException(status_code=400, detail="Gesture type is required")
+    
+    # Trigger gesture
+    result = await AnimationService.trigger_gesture(gesture_type, gesture_data.model_dump())
+    
+    return result
 
 @router.get("/status")
 async def get_animation_status():
     """Get current animation status"""
-    try:
-        status = AnimationService.get_animation_status()
-        return status
-        
-    except Exception as e:
-        logger.error(f"Error getting animation status: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    status = AnimationService.get_animation_status()
+    return make_json_response(status)
 
 @router.websocket("/ws")
 async def animation_websocket(websocket: WebSocket):
-    """WebSocket endpoint for real-time animation updates"""
-    await websocket.accept()
+    """WebSocket endpoint for real-time animation updates, answered in batches (see BATCH_INTERVAL)"""
+    use_msgpack = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if use_msgpack else None)
     
-    try:
+    receive = websocket.receive_bytes if use_msgpack else lambda: receive_frame(websocket)
+    decode = _msgpack_decoder.decode if use_msgpack else orjson.loads
+    encode = _msgpack_encoder.encode if use_msgpack else json_dumps
+    # JSON replies go out as text frames, MessagePack ones as binary
+    send = websocket.send_bytes if use_msgpack else lambda data: websocket.send_text(data.decode())
+    
+    queue: asyncio.Queue = asyncio.Queue(maxsize=BATCH_QUEUE_SIZE)
+    
+    async def receive_frames():
         while True:
-            # Receive animation data from client
-            data = await websocket.receive_text()
-            animation_data = json.loads(data)
-            
-            # Process animation
-            result = await AnimationService.create_complete_animation(
-                animation_data.get("type", "unknown"),
-                animation_data.get("parameters", {})
-            )
+            # Receive animation data from client, dropping the oldest frame when behind
+            animation_data = decode(await receive())
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(animation_data)
+    
+    async def flush_batches():
+        while True:
+            await asyncio.sleep(BATCH_INTERVAL)
             
-            # Send result back
-            await websocket.send_text(json.dumps(result))
+            # Process only what arrived before this flush
+            results = []
+            for _ in range(queue.qsize()):
+                animation_data = queue.get_nowait()
+                results.append(await AnimationService.create_complete_animation(
+                    animation_data.get("type", "unknown"),
+                    animation_data.get("parameters", {})
+                ))
             
+            # Send results back as one frame, always an array
+            if results:
+                await send(encode(results))
+    
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(flush_batches())]
+    try:
+        await asyncio.gather(*tasks)
+        
     except WebSocketDisconnect:
         logger.info("Animation WebSocket disconnected")
     except Exception as e:
         logger.error(f"Animation WebSocket error: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await send(encode({
                 "error": str(e)
             }))
         except:
-            pass 
\ No newline at end of file
+            pass
+    finally:
+        for task in tasks:
+            task.cancel() 
\ No newline at end of file
@@ -2,84 +2,78 @@
 Audio API routes for Virtual Human
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Optional
 import logging
 
-from core.audio_service import AudioService
+from api.responses import json_dumps, make_json_response
+from core.audio_service import AudioService, b64encode_as_string
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+class TTSRequest(BaseModel):
+    """Text-to-speech request model"""
+    text: str = ""
+    voice_id: Optional[str] = None
+
+async def _speech_events(text: str, voice_id: Optional[str]):
+    """Wrap streamed TTS audio in server-sent events carrying base64 chunks"""
+    async for chunk in AudioService.stream_text_to_speech(text, voice_id):
+        yield b"data: " + json_dumps({"audio_base64": b64encode_as_string(chunk)}) + b"\n\n"
+    yield b"data: " + json_dumps({"done": True}) + b"\n\n"
+
 @router.post("/stt")
 async def speech_to_text(audio_file: UploadFile = File(...)):
     """Convert speech to text"""
-    try:
-        # Read audio file
-        audio_data = await audio_file.read()
-        
-        # Process with audio service
-        result = await AudioService.speech_to_text(audio_data)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error in speech to text: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Hand over the spooled upload instead of reading it into memory
+    result = await AudioService.speech_to_text(audio_file.file, content_type=audio_file.content_type)
+    
+    return make_json_response(result)
 
 @router.post("/tts")
-async def text_to_speech(request_data: Dict[str, Any]):
+async def text_to_speech(request_data: TTSRequest, request: Request):
     """Convert text to speech"""
-    try:
-        text = request_data.get("text", "")
-        voice_id = request_data.get("voice_id")
-        
-        if not text:
-            raise HTTPException(status_code=400, detail="Text is required")
-        
-        # Generate speech
-        result = await AudioService.text_to_speech(text, voice_id)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error in text to speech: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    text = request_data.text
+    voice_id = request_data.voice_id
+    
+    if not text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    
+    # Streaming clients get audio as it is synthesized: raw MP3, or base64 chunks over SSE
+    accept = request.headers.get("accept", "")
+    if not AudioService.is_demo_mode():
+        if "audio/mpeg" in accept:
+            return StreamingResponse(
+                AudioService.stream_text_to_speech(text, voice_id),
+                media_type="audio/mpeg"
+            )
+        if "text/event-stream" in accept:
+            return StreamingResponse(_speech_events(text, voice_id), media_type="text/event-stream")
+    
+    # Generate speech
+    result = await AudioService.text_to_speech(text, voice_id)
+    
+    return make_json_response(result)
 
 @router.get("/voices")
 async def get_available_voices():
     """Get available voices"""
-    try:
-        voices = AudioService.get_available_voices()
-        return {"voices": voices}
-        
-    except Exception as e:
-        logger.error(f"Error getting voices: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    voices = AudioService.get_available_voices()
+    return make_json_response({"voices": voices})
 
 @router.post("/analyze")
 async def analyze_audio_emotion(audio_file: UploadFile = File(...)):
     """Analyze audio for emotion"""
-    try:
-        # Read audio file
-        audio_data = await audio_file.read()
-        
-        # Analyze emotion
-        result = await AudioService.analyze_audio_emotion(audio_data)
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error analyzing audio emotion: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Analyze emotion straight from the spooled upload
+    result = await AudioService.analyze_audio_emotion(audio_file.file, content_type=audio_file.content_type)
+    
+    return make_json_response(result)
 
 @router.post("/stream")
 async def process_audio_stream(audio_data: bytes):
     """Process streaming audio data"""
-    try:
-        result = await AudioService.process_audio_stream(audio_data)
-        return result
-        
-    except Exception as e:
-        logger.error(f"Error processing audio stream: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+    result = await AudioService.process_audio_stream(audio_data)
+    return make_json_response(result) 
\ No newline at end of file
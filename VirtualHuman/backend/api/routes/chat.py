@@ -2,84 +2,136 @@
 Chat API routes for Virtual Human
 """
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from typing import Dict, Any, Optional
-import json
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from collections import OrderedDict
+from typing import Tuple
+import hashlib
 import logging
+import orjson
 
+from api.responses import json_dumps, make_json_response, receive_frame
+from core.history_store import HistoryStore
 from core.llm_service import LLMService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+class SendMessageRequest(BaseModel):
+    """Chat message request model"""
+    message: str = ""
+    session_id: str = "default"
+
 # In-memory storage for demo purposes
 sessions = {}
-conversation_history = {}
+
+# LRU of serialized /send responses keyed by (session_id, normalized message digest)
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_MAX_INPUT = 200
+_response_cache: "OrderedDict[Tuple[str, bytes], Tuple[str, bytes]]" = OrderedDict()
+
+def _response_cache_key(session_id: str, user_input: str) -> Tuple[str, bytes]:
+    """Build the response cache key for a message"""
+    normalized = " ".join(user_input.lower().split())
+    return session_id, hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+def _evict_cached_responses(session_id: str):
+    """Drop a session's cached /send responses"""
+    for key in [key for key in _response_cache if key[0] == session_id]:
+        del _response_cache[key]
+
+async def _response_events(user_input: str, session_id: str):
+    """Relay streamed LLM output as server-sent events and record the finished turn"""
+    async for event in LLMService.stream_response(user_input=user_input, session_id=session_id):
+        if "response" in event:
+            await HistoryStore.append(session_id, {
+                "user": user_input,
+                "assistant": event["response"]
+            })
+        yield b"data: " + json_dumps(event) + b"\n\n"
 
 @router.post("/send")
-async def send_message(message_data: Dict[str, Any]):
+async def send_message(message_data: SendMessageRequest, request: Request):
     """Send a message and get response"""
-    try:
-        user_input = message_data.get("message", "")
-        session_id = message_data.get("session_id", "default")
-        
-        if not user_input:
-            raise HTTPException(status_code=400, detail="Message is required")
-        
-        # Generate response using LLM service
-        response = await LLMService.generate_response(
-            user_input=user_input,
-            session_id=session_id
-        )
-        
-        # Store in conversation history
-        if session_id not in conversation_history:
-            conversation_history[session_id] = []
-        
-        conversation_history[session_id].append({
+    user_input = message_data.message
+    session_id = message_data.session_id
+    
+    if not user_input:
+        raise HTTPException(status_code=400, detail="Message is required")
+    
+    # Streaming clients get sentences as the model produces them
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_response_events(user_input, session_id), media_type="text/event-stream")
+    
+    # Repeated prompts (greetings, button-driven input, retries) skip the model
+    cacheable = len(user_input) < RESPONSE_CACHE_MAX_INPUT
+    cache_key = _response_cache_key(session_id, user_input) if cacheable else None
+    cached = _response_cache.get(cache_key) if cacheable else None
+    if cached is not None:
+        _response_cache.move_to_end(cache_key)
+        assistant_text, body = cached
+        # Keep the model's context in step with the stored transcript
+        LLMService.record_turn(session_id, user_input, assistant_text)
+        await HistoryStore.append(session_id, {
             "user": user_input,
-            "assistant": response["response"]
+            "assistant": assistant_text
         })
-        
-        return {
-            "response": response["response"],
-            "animation_triggers": response.get("animation_triggers", {}),
-            "session_id": session_id,
-            "mode": response.get("mode", "unknown")
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in send_message: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return Response(body, media_type="application/json")
+    
+    # Generate response using LLM service
+    response = await LLMService.generate_response(
+        user_input=user_input,
+        session_id=session_id
+    )
+    
+    # Store in conversation history
+    await HistoryStore.append(session_id, {
+        "user": user_input,
+        "assistant": response["response"]
+    })
+    
+    body = json_dumps({
+        "response": response["response"],
+        "animation_triggers": response.get("animation_triggers", {}),
+        "session_id": session_id,
+        "mode": response.get("mode", "unknown")
+    })
+    
+    # Fallback answers are produced after an LLM error and must not stick
+    if cacheable and response.get("mode") != "fallback":
+        _response_cache[cache_key] = (response["response"], body)
+        if len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+    
+    return Response(body, media_type="application/json")
 
 @router.get("/sessions")
 async def get_sessions():
     """Get all active sessions"""
-    return {
+    return make_json_response({
         "sessions": list(sessions.keys()),
         "total": len(sessions)
-    }
+    })
 
 @router.get("/history/{session_id}")
 async def get_conversation_history(session_id: str):
     """Get conversation history for a session"""
-    if session_id not in conversation_history:
-        return {"messages": [], "session_id": session_id}
-    
-    return {
-        "messages": conversation_history[session_id],
-        "session_id": session_id
-    }
+    # Entries are stored orjson-encoded, so splice them into the body without re-parsing
+    messages = await HistoryStore.get_raw(session_id)
+    body = b'{"messages":[' + b",".join(messages) + b'],"session_id":' + json_dumps(session_id) + b"}"
+    return Response(body, media_type="application/json")
 
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session and its history"""
     if session_id in sessions:
         del sessions[session_id]
-    if session_id in conversation_history:
-        del conversation_history[session_id]
+    await HistoryStore.delete(session_id)
+    LLMService.clear_conversation_history(session_id)
+    _evict_cached_responses(session_id)
     
-    return {"message": f"Session {session_id} deleted successfully"}
+    return make_json_response({"message": f"Session {session_id} deleted successfully"})
 
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
@@ -89,8 +141,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            data = await receive_frame(websocket)
+            message_data = orjson.loads(data)
             
             # Generate response
             response = await LLMService.generate_response(
@@ -99,7 +151,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             )
             
             # Send response back
-            await websocket.send_text(json.dumps({
+            await websocket.send_bytes(json_dumps({
                 "response": response["response"],
                 "animation_triggers": response.get("animation_triggers", {}),
                 "session_id": session_id,
@@ -111,7 +163,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         try:
-            await websocket.send_text(json.dumps({
+            await websocket.send_bytes(json_dumps({
                 "error": str(e),
                 "session_id": session_id
             }))
@@ -5,20 +5,101 @@ Handles avatar animation and MediaPipe integration
 
 import logging
 import asyncio
-import json
-from typing import Dict, Any, Optional, List
+import itertools
+import sys
+from collections import deque
+from time import monotonic_ns
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Mapping, Tuple, Union
+import msgspec
+import numpy as np
 import websockets
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+class Blendshape(msgspec.Struct):
+    """Blendshape frame sent to Unity (data is float32 weights in AnimationService._ARKIT_ORDER)"""
+    type: str
+    data: bytes
+    duration: float
+
+# Unity frames are MessagePack-encoded binary messages. A message holds either a
+# single frame or, when the writer drained several at once, an array of frames.
+_encoder = msgspec.msgpack.Encoder()
+
+def _frame_type(frame: Union[Dict[str, Any], Blendshape]) -> str:
+    """Get the type of an outgoing Unity frame"""
+    return frame["type"] if isinstance(frame, dict) else frame.type
+
 class AnimationService:
     """Service for managing avatar animations"""
     
     _is_healthy: bool = False
     _demo_mode: bool = False
     _websocket_connection = None
-    _animation_queue: List[Dict[str, Any]] = []
+    # Recent gestures, kept for status reporting only
+    ANIMATION_QUEUE_SIZE: int = 512
+    _animation_queue: deque = deque(maxlen=ANIMATION_QUEUE_SIZE)
+    # Monotonic source of animation ids
+    _animation_ids = itertools.count()
+    
+    # Outgoing Unity frames, drained by a single writer task
+    SEND_QUEUE_SIZE: int = 64
+    RECONNECT_MIN_DELAY: float = 0.5
+    RECONNECT_MAX_DELAY: float = 30.0
+    _send_queue: Optional[asyncio.Queue] = None
+    _writer_task: Optional[asyncio.Task] = None
+    
+    # MediaPipe blendshape name -> ARKit blendshape name, interned so every
+    # frame reuses the same key objects
+    _ARKIT_MAP: Mapping[str, str] = MappingProxyType({sys.intern(k): sys.intern(v) for k, v in {
+        "browDown_L": "browDown_L",
+        "browDown_R": "browDown_R",
+        "browUp_L": "browUp_L",
+        "browUp_R": "browUp_R",
+        "cheekPuff": "cheekPuff",
+        "eyeBlink_L": "eyeBlink_L",
+        "eyeBlink_R": "eyeBlink_R",
+        "eyeLookDown_L": "eyeLookDown_L",
+        "eyeLookDown_R": "eyeLookDown_R",
+        "eyeLookIn_L": "eyeLookIn_L",
+        "eyeLookIn_R": "eyeLookIn_R",
+        "eyeLookOut_L": "eyeLookOut_L",
+        "eyeLookOut_R": "eyeLookOut_R",
+        "eyeLookUp_L": "eyeLookUp_L",
+        "eyeLookUp_R": "eyeLookUp_R",
+        "jawForward": "jawForward",
+        "jawLeft": "jawLeft",
+        "jawOpen": "jawOpen",
+        "jawRight": "jawRight",
+        "mouthClose": "mouthClose",
+        "mouthFunnel": "mouthFunnel",
+        "mouthLeft": "mouthLeft",
+        "mouthPucker": "mouthPucker",
+        "mouthRight": "mouthRight",
+        "mouthSmile_L": "mouthSmile_L",
+        "mouthSmile_R": "mouthSmile_R",
+        "mouthFrown_L": "mouthFrown_L",
+        "mouthFrown_R": "mouthFrown_R"
+    }.items()})
+    
+    _BLENDSHAPE_CATEGORIES: Dict[str, List[str]] = {
+        "brow": ["browDown", "browUp"],
+        "eye": ["eyeBlink", "eyeLook"],
+        "mouth": ["mouthClose", "mouthOpen", "mouthSmile", "mouthFrown"],
+        "jaw": ["jawOpen", "jawForward", "jawLeft", "jawRight"],
+        "cheek": ["cheekPuff"]
+    }
+    
+    # Fixed blendshape layout used for float32 arrays
+    _ARKIT_ORDER: Tuple[str, ...] = tuple(_ARKIT_MAP.values())
+    _ARKIT_INDEX: Mapping[str, int] = MappingProxyType({name: i for i, name in enumerate(_ARKIT_ORDER)})
+    # MediaPipe blendshape name -> slot in _ARKIT_ORDER
+    _LANDMARK_INDEX: Mapping[str, int] = MappingProxyType({key: i for i, key in enumerate(_ARKIT_MAP)})
+    
+    # ARKit blendshape name -> category, filled by _build_blendshape_categories()
+    _BLENDSHAPE_CATEGORY: Dict[str, str] = {}
     
     @classmethod
     async def initialize(cls):
@@ -31,19 +112,21 @@ class AnimationService:
                 cls._demo_mode = True
                 return
             
+            # The writer runs whether or not Unity is up yet; it (re)connects with backoff as frames arrive
+            cls._is_healthy = True
+            cls._demo_mode = False
+            cls._send_queue = asyncio.Queue(maxsize=cls.SEND_QUEUE_SIZE)
+            cls._writer_task = asyncio.create_task(cls._writer_loop())
+            
             # Try to connect to Unity WebSocket
             try:
                 cls._websocket_connection = await websockets.connect(
                     settings.unity.websocket_url,
                     timeout=settings.unity.websocket_timeout
                 )
-                cls._is_healthy = True
-                cls._demo_mode = False
                 logger.info("Animation service connected to Unity successfully")
             except Exception as e:
-                logger.warning(f"Failed to connect to Unity: {e}. Running in demo mode.")
-                cls._is_healthy = True
-                cls._demo_mode = True
+                logger.warning(f"Failed to connect to Unity: {e}. Will retry when animation data is sent.")
                 
         except Exception as e:
             logger.error(f"Failed to initialize Animation service: {e}")
@@ -53,8 +136,17 @@ class AnimationService:
     @classmethod
     async def cleanup(cls):
         """Cleanup resources"""
+        if cls._writer_task:
+            cls._writer_task.cancel()
+            try:
+                await cls._writer_task
+            except asyncio.CancelledError:
+                pass
+            cls._writer_task = None
+        cls._send_queue = None
         if cls._websocket_connection:
             await cls._websocket_connection.close()
+            cls._websocket_connection = None
         cls._is_healthy = False
         logger.info("Animation service cleaned up")
     
@@ -73,7 +165,7 @@ class AnimationService:
         try:
             if cls._demo_mode:
                 return {
-                    "animation_id": f"demo_{animation_type}_{len(cls._animation_queue)}",
+                    "animation_id": f"demo_{animation_type}_{next(cls._animation_ids)}",
                     "type": animation_type,
                     "parameters": parameters,
                     "status": "created",
@@ -83,12 +175,12 @@ class AnimationService:
             # Create animation data
             animation_data = cls._create_animation_data(animation_type, parameters)
             
-            # Send to Unity if connected
-            if cls._websocket_connection:
+            # Queue for Unity; the writer reconnects if the socket is down
+            if cls._send_queue is not None and not cls._demo_mode:
                 await cls.send_animation_data(animation_data)
             
             return {
-                "animation_id": f"anim_{animation_type}_{len(cls._animation_queue)}",
+                "animation_id": f"anim_{animation_type}_{next(cls._animation_ids)}",
                 "type": animation_type,
                 "parameters": parameters,
                 "status": "created",
@@ -109,7 +201,7 @@ class AnimationService:
     @classmethod
     async def create_blendshape_animation(
         cls,
-        blendshapes: Dict[str, float],
+        blendshapes: Union[Dict[str, float], List[float], bytes, np.ndarray],
         duration: float = 1.0
     ) -> Dict[str, Any]:
         """Create facial blendshape animation"""
@@ -126,17 +218,17 @@ class AnimationService:
             # Process blendshapes
             processed_blendshapes = cls._process_face_mesh_landmarks(blendshapes)
             
-            # Send to Unity
-            if cls._websocket_connection:
-                await cls.send_animation_data({
-                    "type": "blendshape",
-                    "data": processed_blendshapes,
-                    "duration": duration
-                })
+            # Queue for Unity; the writer reconnects if the socket is down
+            if cls._send_queue is not None and not cls._demo_mode:
+                await cls.send_animation_data(Blendshape(
+                    type="blendshape",
+                    data=processed_blendshapes.tobytes(),
+                    duration=duration
+                ))
             
             return {
                 "type": "blendshape",
-                "blendshapes": processed_blendshapes,
+                "blendshapes": dict(zip(cls._ARKIT_ORDER, processed_blendshapes.tolist())),
                 "duration": duration,
                 "status": "created",
                 "mode": "production"
@@ -173,8 +265,8 @@ class AnimationService:
             # Process gesture
             gesture_data = cls._detect_gestures_from_pose(gesture_type, intensity)
             
-            # Send to Unity
-            if cls._websocket_connection:
+            # Queue for Unity; the writer reconnects if the socket is down
+            if cls._send_queue is not None and not cls._demo_mode:
                 await cls.send_animation_data({
                     "type": "gesture",
                     "data": gesture_data
@@ -200,72 +292,102 @@ class AnimationService:
             }
     
     @classmethod
-    async def send_animation_data(cls, animation_data: Dict[str, Any]):
-        """Send animation data to Unity via WebSocket"""
+    async def send_animation_data(cls, animation_data: Union[Dict[str, Any], Blendshape]):
+        """Queue animation data for the Unity writer task"""
         try:
-            if cls._websocket_connection and not cls._demo_mode:
-                await cls._websocket_connection.send(json.dumps(animation_data))
-                logger.debug(f"Sent animation data: {animation_data['type']}")
-            else:
-                logger.debug(f"Demo mode - animation data: {animation_data['type']}")
+            if cls._send_queue is None or cls._demo_mode:
+                logger.debug(f"Demo mode - animation data: {_frame_type(animation_data)}")
+                return
+            
+            # Real-time animation prefers fresh frames: drop the oldest when full
+            if cls._send_queue.full():
+                cls._send_queue.get_nowait()
+            cls._send_queue.put_nowait(animation_data)
         except Exception as e:
             logger.error(f"Error sending animation data: {e}")
     
+    @classmethod
+    async def _writer_loop(cls):
+        """Drain queued frames to Unity, reconnecting with backoff when the socket drops"""
+        delay = cls.RECONNECT_MIN_DELAY
+        while True:
+            frames = [await cls._send_queue.get()]
+            while not cls._send_queue.empty():
+                frames.append(cls._send_queue.get_nowait())
+            frames = cls._coalesce_frames(frames)
+            
+            try:
+                payload = _encoder.encode(frames[0] if len(frames) == 1 else frames)
+                if cls._websocket_connection is None:
+                    cls._websocket_connection = await websockets.connect(
+                        settings.unity.websocket_url,
+                        open_timeout=settings.unity.websocket_timeout
+                    )
+                    logger.info("Reconnected to Unity")
+                await cls._websocket_connection.send(payload)
+                delay = cls.RECONNECT_MIN_DELAY
+                logger.debug(f"Sent {len(frames)} animation frame(s)")
+            except (websockets.ConnectionClosed, OSError, asyncio.TimeoutError) as e:
+                # The failed frames are stale by the time we reconnect, so they are dropped
+                logger.warning(f"Unity connection lost: {e}. Retrying in {delay:.1f}s")
+                cls._websocket_connection = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, cls.RECONNECT_MAX_DELAY)
+            except Exception as e:
+                logger.error(f"Error sending animation data: {e}")
+    
+    @classmethod
+    def _coalesce_frames(
+        cls,
+        frames: List[Union[Dict[str, Any], Blendshape]]
+    ) -> List[Union[Dict[str, Any], Blendshape]]:
+        """Keep only the latest of consecutive blendshape snapshots"""
+        coalesced = []
+        for frame in frames:
+            if coalesced and _frame_type(frame) == "blendshape" and _frame_type(coalesced[-1]) == "blendshape":
+                coalesced[-1] = frame
+            else:
+                coalesced.append(frame)
+        return coalesced
+    
     @classmethod
     def _create_animation_data(cls, animation_type: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Create animation data structure"""
         return {
             "type": animation_type,
             "parameters": parameters,
-            "timestamp": asyncio.get_event_loop().time(),
-            "id": f"anim_{len(cls._animation_queue)}"
+            "timestamp": monotonic_ns() * 1e-9,
+            "id": f"anim_{next(cls._animation_ids)}"
         }
     
     @classmethod
-    def _process_face_mesh_landmarks(cls, landmarks: Dict[str, float]) -> Dict[str, float]:
-        """Process MediaPipe face mesh landmarks"""
-        processed = {}
+    def _process_face_mesh_landmarks(
+        cls,
+        landmarks: Union[Dict[str, float], List[float], bytes, np.ndarray]
+    ) -> np.ndarray:
+        """Process MediaPipe face mesh landmarks into a float32 array in _ARKIT_ORDER"""
+        if isinstance(landmarks, bytes):
+            landmarks = np.frombuffer(landmarks, dtype=np.float32)
+        
+        if not isinstance(landmarks, dict):
+            # Already laid out in _ARKIT_ORDER
+            processed = np.asarray(landmarks, dtype=np.float32)
+            if processed.shape != (len(cls._ARKIT_ORDER),):
+                raise ValueError(f"Expected {len(cls._ARKIT_ORDER)} blendshape values, got {processed.size}")
+            return processed
+        
+        processed = np.zeros(len(cls._ARKIT_ORDER), dtype=np.float32)
         for key, value in landmarks.items():
             # Map MediaPipe landmarks to ARKit blendshapes
-            arkit_key = cls._map_blendshapes_to_arkit(key)
-            if arkit_key:
-                processed[arkit_key] = value
+            index = cls._LANDMARK_INDEX.get(key)
+            if index is not None:
+                processed[index] = value
         return processed
     
     @classmethod
     def _map_blendshapes_to_arkit(cls, mediapipe_key: str) -> Optional[str]:
         """Map MediaPipe landmarks to ARKit blendshapes"""
-        mapping = {
-            "browDown_L": "browDown_L",
-            "browDown_R": "browDown_R",
-            "browUp_L": "browUp_L",
-            "browUp_R": "browUp_R",
-            "cheekPuff": "cheekPuff",
-            "eyeBlink_L": "eyeBlink_L",
-            "eyeBlink_R": "eyeBlink_R",
-            "eyeLookDown_L": "eyeLookDown_L",
-            "eyeLookDown_R": "eyeLookDown_R",
-            "eyeLookIn_L": "eyeLookIn_L",
-            "eyeLookIn_R": "eyeLookIn_R",
-            "eyeLookOut_L": "eyeLookOut_L",
-            "eyeLookOut_R": "eyeLookOut_R",
-            "eyeLookUp_L": "eyeLookUp_L",
-            "eyeLookUp_R": "eyeLookUp_R",
-            "jawForward": "jawForward",
-            "jawLeft": "jawLeft",
-            "jawOpen": "jawOpen",
-            "jawRight": "jawRight",
-            "mouthClose": "mouthClose",
-            "mouthFunnel": "mouthFunnel",
-            "mouthLeft": "mouthLeft",
-            "mouthPucker": "mouthPucker",
-            "mouthRight": "mouthRight",
-            "mouthSmile_L": "mouthSmile_L",
-            "mouthSmile_R": "mouthSmile_R",
-            "mouthFrown_L": "mouthFrown_L",
-            "mouthFrown_R": "mouthFrown_R"
-        }
-        return mapping.get(mediapipe_key)
+        return cls._ARKIT_MAP.get(mediapipe_key)
     
     @classmethod
     def _detect_gestures_from_pose(cls, gesture_type: str, intensity: float) -> Dict[str, Any]:
@@ -282,18 +404,18 @@ class AnimationService:
     @classmethod
     def _get_blendshape_category(cls, blendshape_name: str) -> str:
         """Get the category of a blendshape"""
-        categories = {
-            "brow": ["browDown", "browUp"],
-            "eye": ["eyeBlink", "eyeLook"],
-            "mouth": ["mouthClose", "mouthOpen", "mouthSmile", "mouthFrown"],
-            "jaw": ["jawOpen", "jawForward", "jawLeft", "jawRight"],
-            "cheek": ["cheekPuff"]
-        }
-        
-        for category, names in categories.items():
-            if any(name in blendshape_name for name in names):
-                return category
-        return "other"
+        return cls._BLENDSHAPE_CATEGORY.get(blendshape_name, "other")
+    
+    @classmethod
+    def _build_blendshape_categories(cls):
+        """Precompute the category of every known ARKit blendshape"""
+        for blendshape_name in cls._ARKIT_MAP.values():
+            category = "other"
+            for candidate, names in cls._BLENDSHAPE_CATEGORIES.items():
+                if any(name in blendshape_name for name in names):
+                    category = candidate
+                    break
+            cls._BLENDSHAPE_CATEGORY[blendshape_name] = category
     
     @classmethod
     async def trigger_gesture(cls, gesture_type: str, parameters: Dict[str, Any] = None):
@@ -326,4 +448,6 @@ class AnimationService:
             "websocket_connected": cls._websocket_connection is not None,
             "demo_mode": cls._demo_mode,
             "healthy": cls._is_healthy
-        } 
\ No newline at end of file
+        }
+
+AnimationService._build_blendshape_categories()
\ No newline at end of file
@@ -5,24 +5,87 @@ Handles speech-to-text and text-to-speech functionality
 
 import logging
 import asyncio
-from typing import Dict, Any, Optional, List
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, AsyncIterator, BinaryIO, Mapping, Tuple, Union
 import io
-import base64
-from elevenlabs import generate, save, set_api_key, voices
+import orjson
 from core.config import settings
 
+# pybase64 (SIMD) is optional; the stdlib encoder produces identical output
+try:
+    from pybase64 import b64encode_as_string
+except ImportError:
+    import base64
+    
+    def b64encode_as_string(data: bytes) -> str:
+        return base64.b64encode(data).decode("ascii")
+
 logger = logging.getLogger(__name__)
 
+# The ElevenLabs SDK is imported on first real use; demo mode never loads it
+_elevenlabs = None
+
+def _get_elevenlabs():
+    """Import the ElevenLabs SDK once and return the module"""
+    global _elevenlabs
+    if _elevenlabs is None:
+        import elevenlabs
+        _elevenlabs = elevenlabs
+    return _elevenlabs
+
+# Demo-mode TTS result for the default demo voice, shared read-only between calls
+_DEMO_TTS_RESPONSE = MappingProxyType({
+    "audio_base64": "demo_audio_data",
+    "duration": 2.5,
+    "voice_id": "demo_voice_1",
+    "mode": "demo"
+})
+
+async def _noop():
+    """Awaitable placeholder for an optional step in asyncio.gather"""
+    return None
+
 class AudioService:
     """Service for managing audio processing"""
     
     _is_healthy: bool = False
     _demo_mode: bool = False
-    _available_voices: List[Dict[str, Any]] = []
+    # Written once when voices are loaded, so readers can share it without copying
+    _available_voices: Tuple[Dict[str, Any], ...] = ()
+    
+    # Voice used when a request doesn't name one, snapshotted from settings in initialize()
+    _default_voice_id: str = settings.elevenlabs.voice_id
+    
+    # Chunk size requested from the ElevenLabs streaming endpoint
+    TTS_STREAM_CHUNK_SIZE: int = 4096
+    
+    # The ElevenLabs voice list is cached on disk so restarts skip the API call
+    VOICES_CACHE_TTL: float = 24 * 60 * 60
+    _voices_cache_path: Path = Path(tempfile.gettempdir()) / "el_voices.json"
+    
+    # Synthesized speech keyed by sha256(model|voice|text): memory LRU in front of a disk tier
+    TTS_MODEL: str = "eleven_monolingual_v1"
+    TTS_MEMORY_CACHE_SIZE: int = 256
+    TTS_CACHE_TTL: float = 7 * 24 * 60 * 60
+    # Per-user app cache rather than a fixed path in the shared temp directory; created owner-only
+    _tts_cache_dir: Path = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "virtual_human" / "tts"
+    _tts_memory_cache: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+    
+    # ElevenLabs SDK calls are blocking; they run in worker threads, at most this many at once
+    ELEVENLABS_MAX_CONCURRENCY: int = 8
+    _elevenlabs_semaphore: asyncio.Semaphore = asyncio.Semaphore(ELEVENLABS_MAX_CONCURRENCY)
     
     @classmethod
     async def initialize(cls):
         """Initialize the Audio service"""
+        cls._default_voice_id = settings.elevenlabs.voice_id
+        
         try:
             # Check if ElevenLabs API key is configured
             if not settings.elevenlabs.api_key or settings.elevenlabs.api_key == "your_elevenlabs_api_key_here":
@@ -32,7 +95,7 @@ class AudioService:
                 return
             
             # Set API key
-            set_api_key(settings.elevenlabs.api_key)
+            _get_elevenlabs().set_api_key(settings.elevenlabs.api_key)
             
             # Load available voices
             await cls._load_voices()
@@ -57,12 +120,24 @@ class AudioService:
         return cls._is_healthy
     
     @classmethod
-    async def _load_voices(cls):
-        """Load available voices from ElevenLabs"""
+    def is_demo_mode(cls) -> bool:
+        """Check if the service is running without ElevenLabs"""
+        return cls._demo_mode
+    
+    @classmethod
+    async def _load_voices(cls, force_refresh: bool = False):
+        """Load available voices from the disk cache or ElevenLabs"""
         try:
             if not cls._demo_mode:
-                available_voices = voices()
-                cls._available_voices = [
+                cached_voices = None if force_refresh else await asyncio.to_thread(cls._read_voices_cache)
+                if cached_voices is not None:
+                    cls._available_voices = tuple(cached_voices)
+                    logger.info(f"Loaded {len(cls._available_voices)} voices from cache")
+                    return
+                
+                async with cls._elevenlabs_semaphore:
+                    available_voices = await asyncio.to_thread(_get_elevenlabs().voices)
+                cls._available_voices = tuple(
                     {
                         "id": voice.voice_id,
                         "name": voice.name,
@@ -70,25 +145,64 @@ class AudioService:
                         "description": voice.description
                     }
                     for voice in available_voices
-                ]
+                )
+                await asyncio.to_thread(cls._write_voices_cache, cls._available_voices)
                 logger.info(f"Loaded {len(cls._available_voices)} voices")
             else:
                 # Demo voices
-                cls._available_voices = [
+                cls._available_voices = (
                     {
                         "id": "demo_voice_1",
                         "name": "Demo Voice 1",
                         "category": "demo",
                         "description": "Demo voice for testing"
-                    }
-                ]
+                    },
+                )
         except Exception as e:
             logger.error(f"Failed to load voices: {e}")
-            cls._available_voices = []
+            cls._available_voices = ()
     
     @classmethod
-    async def speech_to_text(cls, audio_data: bytes) -> Dict[str, Any]:
-        """Convert speech to text using Whisper API"""
+    def _read_voices_cache(cls) -> Optional[List[Dict[str, Any]]]:
+        """Return cached voices if the cache file exists and has not expired"""
+        try:
+            cache = orjson.loads(cls._voices_cache_path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+        
+        # A list fetched with another API key belongs to another account
+        if cache.get("key_hash") != cls._voices_key_hash():
+            return None
+        if time.time() - cache.get("fetched_at", 0) >= cls.VOICES_CACHE_TTL:
+            return None
+        return cache.get("voices")
+    
+    @classmethod
+    def _voices_key_hash(cls) -> str:
+        """Fingerprint of the ElevenLabs API key the voice list was fetched with"""
+        return hashlib.sha256((settings.elevenlabs.api_key or "").encode()).hexdigest()
+    
+    @classmethod
+    def _write_voices_cache(cls, available_voices: Tuple[Dict[str, Any], ...]):
+        """Atomically replace the voices cache file"""
+        try:
+            tmp_path = cls._voices_cache_path.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps({
+                "fetched_at": time.time(),
+                "key_hash": cls._voices_key_hash(),
+                "voices": available_voices
+            }))
+            os.replace(tmp_path, cls._voices_cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write voices cache: {e}")
+    
+    @classmethod
+    async def speech_to_text(
+        cls, 
+        audio_data: Union[bytes, BinaryIO], 
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Convert speech to text using Whisper API (audio as bytes or a file object)"""
         try:
             if cls._demo_mode:
                 return {
@@ -119,29 +233,19 @@ class AudioService:
         cls, 
         text: str, 
         voice_id: Optional[str] = None
-    ) -> Dict[str, Any]:
+    ) -> Mapping[str, Any]:
         """Convert text to speech using ElevenLabs"""
         try:
             if cls._demo_mode:
-                return {
-                    "audio_base64": "demo_audio_data",
-                    "duration": 2.5,
-                    "voice_id": voice_id or "demo_voice_1",
-                    "mode": "demo"
-                }
+                if not voice_id or voice_id == _DEMO_TTS_RESPONSE["voice_id"]:
+                    return _DEMO_TTS_RESPONSE
+                return {**_DEMO_TTS_RESPONSE, "voice_id": voice_id}
             
             if not voice_id:
-                voice_id = settings.elevenlabs.voice_id
+                voice_id = cls._default_voice_id
             
-            # Generate audio using ElevenLabs
-            audio = generate(
-                text=text,
-                voice=voice_id,
-                model="eleven_monolingual_v1"
-            )
-            
-            # Convert to base64 for transmission
-            audio_base64 = base64.b64encode(audio).decode('utf-8')
+            # Generate audio using ElevenLabs, unless this utterance was synthesized before
+            audio, audio_base64 = await cls._get_speech(text, voice_id)
             
             return {
                 "audio_base64": audio_base64,
@@ -161,9 +265,145 @@ class AudioService:
             }
     
     @classmethod
-    def get_available_voices(cls) -> List[Dict[str, Any]]:
+    async def stream_text_to_speech(
+        cls, 
+        text: str, 
+        voice_id: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield raw MP3 audio as ElevenLabs produces it (cached utterances in one piece)"""
+        voice_id = voice_id or cls._default_voice_id
+        key = cls._tts_cache_key(text, voice_id)
+        cached = await cls._lookup_speech(key)
+        if cached is not None:
+            yield cached[0]
+            return
+        
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        
+        def produce():
+            # Runs in a worker thread; the SDK iterator blocks between chunks
+            try:
+                for chunk in _get_elevenlabs().generate(
+                    text=text,
+                    voice=voice_id,
+                    model=cls.TTS_MODEL,
+                    stream=True,
+                    stream_chunk_size=cls.TTS_STREAM_CHUNK_SIZE
+                ):
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+            except Exception as e:
+                loop.call_soon_threadsafe(chunks.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+        
+        audio = bytearray()
+        async with cls._elevenlabs_semaphore:
+            producer = asyncio.ensure_future(asyncio.to_thread(produce))
+            while (chunk := await chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                audio += chunk
+                yield chunk
+            await producer
+        
+        # Complete utterances are cached like non-streamed ones
+        audio = bytes(audio)
+        await asyncio.to_thread(cls._write_tts_cache, key, audio)
+        cls._remember_speech(key, audio)
+    
+    @classmethod
+    async def _generate_audio(cls, text: str, voice_id: str) -> bytes:
+        """Synthesize MP3 audio with ElevenLabs in a worker thread"""
+        async with cls._elevenlabs_semaphore:
+            return await asyncio.to_thread(
+                _get_elevenlabs().generate,
+                text=text,
+                voice=voice_id,
+                model=cls.TTS_MODEL
+            )
+    
+    @classmethod
+    async def _get_speech(cls, text: str, voice_id: str) -> Tuple[bytes, str]:
+        """Get MP3 audio and its base64 form from memory, disk, or ElevenLabs, in that order"""
+        key = cls._tts_cache_key(text, voice_id)
+        cached = await cls._lookup_speech(key)
+        if cached is None:
+            audio = await cls._generate_audio(text, voice_id)
+            await asyncio.to_thread(cls._write_tts_cache, key, audio)
+            cached = cls._remember_speech(key, audio)
+        return cached
+    
+    @classmethod
+    def _tts_cache_key(cls, text: str, voice_id: str) -> str:
+        """Build the speech cache key for an utterance"""
+        return hashlib.sha256(f"{cls.TTS_MODEL}|{voice_id}|{text}".encode()).hexdigest()
+    
+    @classmethod
+    async def _lookup_speech(cls, key: str) -> Optional[Tuple[bytes, str]]:
+        """Find cached speech in memory, then on disk"""
+        cached = cls._tts_memory_cache.get(key)
+        if cached is not None:
+            cls._tts_memory_cache.move_to_end(key)
+            return cached
+        
+        # File reads run in a worker thread, like the synthesis calls
+        audio = await asyncio.to_thread(cls._read_tts_cache, key)
+        return cls._remember_speech(key, audio) if audio is not None else None
+    
+    @classmethod
+    def _remember_speech(cls, key: str, audio: bytes) -> Tuple[bytes, str]:
+        """Keep audio and its base64 form in the memory LRU"""
+        cached = (audio, b64encode_as_string(audio))
+        cls._tts_memory_cache[key] = cached
+        if len(cls._tts_memory_cache) > cls.TTS_MEMORY_CACHE_SIZE:
+            cls._tts_memory_cache.popitem(last=False)
+        return cached
+    
+    @classmethod
+    def _read_tts_cache(cls, key: str) -> Optional[bytes]:
+        """Return cached audio from disk if present and not expired"""
+        try:
+            meta = orjson.loads((cls._tts_cache_dir / f"{key}.json").read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, orjson.JSONDecodeError):
+            meta = None
+        
+        try:
+            if meta and time.time() - meta["created_at"] < meta.get("ttl", cls.TTS_CACHE_TTL):
+                return (cls._tts_cache_dir / f"{key}.mp3").read_bytes()
+        except (OSError, KeyError, TypeError):
+            pass
+        
+        # Expired or unreadable: remove it so the directory doesn't grow without bound
+        for suffix in (".mp3", ".json"):
+            try:
+                (cls._tts_cache_dir / f"{key}{suffix}").unlink(missing_ok=True)
+            except OSError:
+                pass
+        return None
+    
+    @classmethod
+    def _write_tts_cache(cls, key: str, audio: bytes):
+        """Atomically store audio and its sidecar metadata on disk"""
+        try:
+            cls._tts_cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            for suffix, data in (
+                (".mp3", audio),
+                (".json", orjson.dumps({"created_at": time.time(), "ttl": cls.TTS_CACHE_TTL}))
+            ):
+                path = cls._tts_cache_dir / f"{key}{suffix}"
+                tmp_path = path.with_suffix(f"{suffix}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write TTS cache: {e}")
+    
+    @classmethod
+    def get_available_voices(cls) -> Tuple[Dict[str, Any], ...]:
         """Get list of available voices"""
-        return cls._available_voices.copy()
+        return cls._available_voices
     
     @classmethod
     async def process_audio_stream(cls, audio_stream: bytes) -> Dict[str, Any]:
@@ -193,8 +433,12 @@ class AudioService:
             }
     
     @classmethod
-    async def analyze_audio_emotion(cls, audio_data: bytes) -> Dict[str, Any]:
-        """Analyze audio for emotional content"""
+    async def analyze_audio_emotion(
+        cls, 
+        audio_data: Union[bytes, BinaryIO], 
+        content_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Analyze audio for emotional content (audio as bytes or a file object)"""
         try:
             if cls._demo_mode:
                 return {
@@ -231,13 +475,11 @@ class AudioService:
     ) -> Dict[str, Any]:
         """Create a complete audio response with emotion"""
         try:
-            # Generate speech
-            speech_result = await cls.text_to_speech(text, voice_id)
-            
-            # Analyze emotion if provided
-            emotion_result = None
-            if emotion:
-                emotion_result = await cls.analyze_audio_emotion(b"demo_audio")
+            # Generate speech and analyze emotion (if provided) concurrently
+            speech_result, emotion_result = await asyncio.gather(
+                cls.text_to_speech(text, voice_id),
+                cls.analyze_audio_emotion(b"demo_audio") if emotion else _noop()
+            )
             
             return {
                 "speech": speech_result,
@@ -3,6 +3,7 @@ Configuration settings for Virtual Human API
 """
 
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
@@ -59,20 +60,25 @@ class ServerSettings(BaseSettings):
 
 class Settings(BaseSettings):
     """Main settings class"""
-    openai: OpenAISettings = OpenAISettings()
-    elevenlabs: ElevenLabsSettings = ElevenLabsSettings()
-    audio: AudioSettings = AudioSettings()
-    animation: AnimationSettings = AnimationSettings()
-    mediapipe: MediaPipeSettings = MediaPipeSettings()
-    unity: UnitySettings = UnitySettings()
-    redis: RedisSettings = RedisSettings()
-    celery: CelerySettings = CelerySettings()
-    server: ServerSettings = ServerSettings()
+    openai: OpenAISettings = Field(default_factory=OpenAISettings)
+    elevenlabs: ElevenLabsSettings = Field(default_factory=ElevenLabsSettings)
+    audio: AudioSettings = Field(default_factory=AudioSettings)
+    animation: AnimationSettings = Field(default_factory=AnimationSettings)
+    mediapipe: MediaPipeSettings = Field(default_factory=MediaPipeSettings)
+    unity: UnitySettings = Field(default_factory=UnitySettings)
+    redis: RedisSettings = Field(default_factory=RedisSettings)
+    celery: CelerySettings = Field(default_factory=CelerySettings)
+    server: ServerSettings = Field(default_factory=ServerSettings)
     
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
         case_sensitive = False
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the settings once; later calls return the same instance"""
+    return Settings()
+
 # Create global settings instance
-settings = Settings() 
\ No newline at end of file
+settings = get_settings() 
\ No newline at end of file
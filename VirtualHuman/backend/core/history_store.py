@@ -0,0 +1,95 @@
+"""
+History Store for Virtual Human API
+Keeps per-session chat transcripts in Redis, with an in-process fallback
+"""
+
+import logging
+from typing import Dict, Any, Optional, List
+import orjson
+import redis.asyncio as redis
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class HistoryStore:
+    """Store for per-session conversation history"""
+    
+    MAX_ENTRIES: int = 100
+    KEY_PREFIX: str = "hist:"
+    # Redis histories expire after this many idle seconds
+    TTL: int = 3600
+    
+    _is_healthy: bool = False
+    _demo_mode: bool = False
+    _redis: Optional[redis.Redis] = None
+    # Used when Redis is unavailable; entries are kept orjson-encoded like in Redis
+    _local_history: Dict[str, List[bytes]] = {}
+    
+    @classmethod
+    async def initialize(cls):
+        """Initialize the History store"""
+        try:
+            cls._redis = redis.Redis.from_url(
+                settings.redis.url,
+                db=settings.redis.db,
+                decode_responses=False,
+                socket_connect_timeout=2
+            )
+            await cls._redis.ping()
+            cls._demo_mode = False
+            logger.info("History store connected to Redis successfully")
+        except Exception as e:
+            logger.warning(f"Failed to connect to Redis: {e}. Keeping history in memory.")
+            if cls._redis:
+                await cls._redis.aclose()
+            cls._redis = None
+            cls._demo_mode = True
+        cls._is_healthy = True
+    
+    @classmethod
+    async def cleanup(cls):
+        """Cleanup resources"""
+        if cls._redis:
+            await cls._redis.aclose()
+            cls._redis = None
+        cls._is_healthy = False
+        logger.info("History store cleaned up")
+    
+    @classmethod
+    def is_healthy(cls) -> bool:
+        """Check if the store is healthy"""
+        return cls._is_healthy
+    
+    @classmethod
+    async def append(cls, session_id: str, entry: Dict[str, Any]):
+        """Append an exchange to a session's history, keeping the last MAX_ENTRIES and refreshing its TTL"""
+        payload = orjson.dumps(entry)
+        
+        if cls._redis:
+            key = cls.KEY_PREFIX + session_id
+            async with cls._redis.pipeline(transaction=False) as pipe:
+                pipe.rpush(key, payload)
+                pipe.ltrim(key, -cls.MAX_ENTRIES, -1)
+                pipe.expire(key, cls.TTL)
+                await pipe.execute()
+            return
+        
+        history = cls._local_history.setdefault(session_id, [])
+        history.append(payload)
+        if len(history) > cls.MAX_ENTRIES:
+            del history[:-cls.MAX_ENTRIES]
+    
+    @classmethod
+    async def get_raw(cls, session_id: str) -> List[bytes]:
+        """Get a session's history as orjson-encoded entries"""
+        if cls._redis:
+            return await cls._redis.lrange(cls.KEY_PREFIX + session_id, 0, -1)
+        return list(cls._local_history.get(session_id, ()))
+    
+    @classmethod
+    async def delete(cls, session_id: str):
+        """Delete a session's history"""
+        if cls._redis:
+            await cls._redis.delete(cls.KEY_PREFIX + session_id)
+        else:
+            cls._local_history.pop(session_id, None)
@@ -5,23 +5,83 @@ Handles interactions with OpenAI and other LLM providers
 
 import logging
 import json
-from typing import List, Dict, Any, Optional
-from openai import AsyncOpenAI
+import re
+from collections import OrderedDict, deque
+from itertools import islice
+from types import MappingProxyType
+from typing import List, Dict, Any, Optional, AsyncIterator, Mapping, Tuple, TYPE_CHECKING
+import httpx
 from core.config import settings
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 logger = logging.getLogger(__name__)
 
+_WORD_RE = re.compile(r"[a-z]+")
+# End of a sentence inside streamed text: terminal punctuation followed by whitespace
+_SENTENCE_END_RE = re.compile(r"[.!?]\s+")
+
 class LLMService:
     """Service for managing LLM interactions"""
     
-    _client: Optional[AsyncOpenAI] = None
+    _client: Optional["AsyncOpenAI"] = None
+    # Shared keep-alive HTTP/2 transport for OpenAI calls
+    _http_client: Optional[httpx.AsyncClient] = None
     _is_healthy: bool = False
     _demo_mode: bool = False
-    _conversation_history: List[Dict[str, str]] = []
+    
+    # Completion parameters, snapshotted from settings in initialize()
+    _model: str = settings.openai.model
+    _max_tokens: int = settings.openai.max_tokens
+    _temperature: float = settings.openai.temperature
+    # Per-session history: only the last 20 messages are kept to prevent memory issues,
+    # the last 10 go to the model, and the least recently used sessions are dropped
+    MAX_HISTORY_MESSAGES: int = 20
+    CONTEXT_MESSAGES: int = 10
+    MAX_SESSIONS: int = 1024
+    DEFAULT_SESSION: str = "default"
+    _conversation_history: "OrderedDict[str, deque]" = OrderedDict()
+    
+    _SYSTEM_PROMPT: str = (
+        "You are a helpful virtual human tutor. "
+        "Provide clear, engaging, and educational responses. "
+        "Use a friendly and conversational tone."
+    )
+    _SYSTEM_MESSAGE: Mapping[str, str] = MappingProxyType({"role": "system", "content": _SYSTEM_PROMPT})
+    
+    # Demo replies by topic, in priority order
+    _DEMO_RESPONSES: Tuple[Tuple[frozenset, str], ...] = (
+        (frozenset({"hello", "hi"}), "Hello! I'm your virtual tutor. I'm currently running in demo mode. How can I help you learn today?"),
+        (frozenset({"math", "calculate"}), "I'd be happy to help you with math! In demo mode, I can explain concepts and provide examples. What specific math topic would you like to explore?"),
+        (frozenset({"science"}), "Science is fascinating! I can help explain scientific concepts, theories, and discoveries. What area of science interests you?"),
+        (frozenset({"history"}), "History is full of amazing stories and lessons! I can help you explore different historical periods and events. What would you like to learn about?"),
+        (frozenset({"help"}), "I'm here to help you learn! I can assist with various subjects like math, science, history, language arts, and more. What would you like to study?")
+    )
+    _DEMO_PATTERN = re.compile(r"\b(hello|hi|math|calculate|science|history|help)\b")
+    _DEMO_DEFAULT_RESPONSE: str = "That's an interesting question about '{user_input}'! I'm currently running in demo mode, but I'd be happy to help you learn about this topic. Could you tell me more about what specifically you'd like to know?"
+    
+    # Animation trigger -> words in a response that fire it
+    _GESTURE_TRIGGERS: Dict[str, frozenset] = {
+        "wave": frozenset({"hello", "hi"}),
+        "thumbs_up": frozenset({"yes", "correct"}),
+        "shake_head": frozenset({"no", "incorrect"})
+    }
+    _EXPRESSION_TRIGGERS: Dict[str, frozenset] = {
+        "smile": frozenset({"happy", "great"}),
+        "thinking": frozenset({"think", "hmm"})
+    }
+    _MOVEMENT_TRIGGERS: Dict[str, frozenset] = {
+        "point": frozenset({"explain", "show"})
+    }
     
     @classmethod
     async def initialize(cls):
         """Initialize the LLM service"""
+        cls._model = settings.openai.model
+        cls._max_tokens = settings.openai.max_tokens
+        cls._temperature = settings.openai.temperature
+        
         try:
             # Check if OpenAI API key is configured
             if not settings.openai.api_key or settings.openai.api_key == "your_openai_api_key_here":
@@ -31,8 +91,16 @@ class LLMService:
                 cls._demo_mode = True
                 return
             
-            # Initialize OpenAI client
-            cls._client = AsyncOpenAI(api_key=settings.openai.api_key)
+            # The SDK is only imported when a key is configured; demo mode never loads it
+            from openai import AsyncOpenAI
+            
+            # Initialize OpenAI client on a pooled HTTP/2 transport so requests reuse TLS connections
+            cls._http_client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(30.0, connect=5.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+            cls._client = AsyncOpenAI(api_key=settings.openai.api_key, http_client=cls._http_client)
             cls._is_healthy = True
             cls._demo_mode = False
             logger.info("LLM service initialized successfully")
@@ -44,6 +112,9 @@ class LLMService:
     @classmethod
     async def cleanup(cls):
         """Cleanup resources"""
+        if cls._http_client:
+            await cls._http_client.aclose()
+            cls._http_client = None
         cls._client = None
         cls._is_healthy = False
         logger.info("LLM service cleaned up")
@@ -58,80 +129,140 @@ class LLMService:
         cls, 
         user_input: str, 
         context: Optional[str] = None,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        include_animation: bool = True
     ) -> Dict[str, Any]:
         """Generate a response using the LLM"""
+        session_id = session_id or cls.DEFAULT_SESSION
+        error = None
         try:
             if cls._demo_mode:
                 # Return demo response
-                demo_response = cls._generate_demo_response(user_input)
-                cls._update_conversation_history(user_input, demo_response)
-                return {
-                    "response": demo_response,
-                    "animation_triggers": cls._analyze_response_for_animation(demo_response),
-                    "session_id": session_id,
-                    "mode": "demo"
-                }
+                response_text = cls._generate_demo_response(user_input)
+                mode = "demo"
+            else:
+                if not cls._client:
+                    raise ValueError("LLM client not initialized")
+                
+                # Build messages for the API call
+                messages = cls._build_messages(session_id, user_input, context)
+                
+                # Call OpenAI API
+                response = await cls._client.chat.completions.create(
+                    model=cls._model,
+                    messages=messages,
+                    max_tokens=cls._max_tokens,
+                    temperature=cls._temperature
+                )
+                
+                # Extract response text
+                choice = response.choices[0]
+                response_text = choice.message.content
+                mode = "production"
             
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            # Fallback to demo mode
+            response_text = cls._generate_demo_response(user_input)
+            mode = "fallback"
+            error = str(e)
+        
+        # Update conversation history
+        cls._update_conversation_history(session_id, user_input, response_text)
+        
+        result = {
+            "response": response_text,
+            "animation_triggers": cls._analyze_response_for_animation(response_text) if include_animation else {},
+            "session_id": session_id,
+            "mode": mode
+        }
+        if error is not None:
+            result["error"] = error
+        return result
+    
+    @classmethod
+    async def stream_response(
+        cls, 
+        user_input: str, 
+        context: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as {"delta": text} sentences, then generate_response's result"""
+        session_id = session_id or cls.DEFAULT_SESSION
+        if cls._demo_mode:
+            result = await cls.generate_response(user_input, context, session_id)
+            yield {"delta": result["response"]}
+            yield result
+            return
+        
+        parts = []
+        pending = ""
+        error = None
+        try:
             if not cls._client:
                 raise ValueError("LLM client not initialized")
             
-            # Build messages for the API call
-            messages = cls._build_messages(user_input, context)
-            
-            # Call OpenAI API
-            response = await cls._client.chat.completions.create(
-                model=settings.openai.model,
-                messages=messages,
-                max_tokens=settings.openai.max_tokens,
-                temperature=settings.openai.temperature
+            stream = await cls._client.chat.completions.create(
+                model=cls._model,
+                messages=cls._build_messages(session_id, user_input, context),
+                max_tokens=cls._max_tokens,
+                temperature=cls._temperature,
+                stream=True
             )
-            
-            # Extract response text
-            response_text = response.choices[0].message.content
-            
-            # Update conversation history
-            cls._update_conversation_history(user_input, response_text)
-            
-            return {
-                "response": response_text,
-                "animation_triggers": cls._analyze_response_for_animation(response_text),
-                "session_id": session_id,
-                "mode": "production"
-            }
-            
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                pending += delta
+                
+                # Hand out whole sentences so TTS can start early without breaking prosody
+                boundary = None
+                for boundary in _SENTENCE_END_RE.finditer(pending):
+                    pass
+                if boundary:
+                    yield {"delta": pending[:boundary.end()]}
+                    pending = pending[boundary.end():]
         except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            # Fallback to demo mode
-            demo_response = cls._generate_demo_response(user_input)
-            cls._update_conversation_history(user_input, demo_response)
-            return {
-                "response": demo_response,
-                "animation_triggers": cls._analyze_response_for_animation(demo_response),
-                "session_id": session_id,
-                "mode": "fallback",
-                "error": str(e)
-            }
+            logger.error(f"Error streaming response: {e}")
+            error = str(e)
+            if not parts:
+                # Fallback to demo mode
+                pending = cls._generate_demo_response(user_input)
+                parts.append(pending)
+        
+        if pending:
+            yield {"delta": pending}
+        
+        response_text = "".join(parts)
+        cls._update_conversation_history(session_id, user_input, response_text)
+        result = {
+            "response": response_text,
+            "animation_triggers": cls._analyze_response_for_animation(response_text),
+            "session_id": session_id,
+            "mode": "production" if error is None else "fallback"
+        }
+        if error is not None:
+            result["error"] = error
+        yield result
     
     @classmethod
-    def _build_messages(cls, user_input: str, context: Optional[str] = None) -> List[Dict[str, str]]:
+    def _build_messages(
+        cls, 
+        session_id: str, 
+        user_input: str, 
+        context: Optional[str] = None
+    ) -> List[Dict[str, str]]:
         """Build messages for the API call"""
-        messages = []
-        
-        # Add system message
-        system_message = (
-            "You are a helpful virtual human tutor. "
-            "Provide clear, engaging, and educational responses. "
-            "Use a friendly and conversational tone."
-        )
+        # Add system message; only a request with context needs its own copy
         if context:
-            system_message += f" Context: {context}"
-        
-        messages.append({"role": "system", "content": system_message})
+            messages = [{"role": "system", "content": f"{cls._SYSTEM_PROMPT} Context: {context}"}]
+        else:
+            messages = [cls._SYSTEM_MESSAGE]
         
         # Add conversation history (last 10 messages)
-        for msg in cls._conversation_history[-10:]:
-            messages.append(msg)
+        history = cls._conversation_history.get(session_id, ())
+        messages.extend(islice(history, max(0, len(history) - cls.CONTEXT_MESSAGES), None))
         
         # Add current user input
         messages.append({"role": "user", "content": user_input})
@@ -139,72 +270,57 @@ class LLMService:
         return messages
     
     @classmethod
-    def _update_conversation_history(cls, user_input: str, response: str):
-        """Update conversation history"""
-        cls._conversation_history.append({"role": "user", "content": user_input})
-        cls._conversation_history.append({"role": "assistant", "content": response})
+    def _update_conversation_history(cls, session_id: str, user_input: str, response: str):
+        """Update conversation history for a session"""
+        history = cls._conversation_history.get(session_id)
+        if history is None:
+            history = cls._conversation_history[session_id] = deque(maxlen=cls.MAX_HISTORY_MESSAGES)
+            if len(cls._conversation_history) > cls.MAX_SESSIONS:
+                cls._conversation_history.popitem(last=False)
+        else:
+            cls._conversation_history.move_to_end(session_id)
         
-        # Keep only last 20 messages to prevent memory issues
-        if len(cls._conversation_history) > 20:
-            cls._conversation_history = cls._conversation_history[-20:]
+        history.append({"role": "user", "content": user_input})
+        history.append({"role": "assistant", "content": response})
     
     @classmethod
     def _analyze_response_for_animation(cls, response: str) -> Dict[str, Any]:
         """Analyze response to determine animation triggers"""
-        triggers = {
-            "gestures": [],
-            "facial_expressions": [],
-            "body_movements": []
-        }
-        
-        # Simple keyword-based analysis
-        response_lower = response.lower()
-        
-        # Gesture triggers
-        if "hello" in response_lower or "hi" in response_lower:
-            triggers["gestures"].append("wave")
-        if "yes" in response_lower or "correct" in response_lower:
-            triggers["gestures"].append("thumbs_up")
-        if "no" in response_lower or "incorrect" in response_lower:
-            triggers["gestures"].append("shake_head")
-        
-        # Facial expression triggers
-        if "happy" in response_lower or "great" in response_lower:
-            triggers["facial_expressions"].append("smile")
-        if "think" in response_lower or "hmm" in response_lower:
-            triggers["facial_expressions"].append("thinking")
-        
-        # Body movement triggers
-        if "explain" in response_lower or "show" in response_lower:
-            triggers["body_movements"].append("point")
+        # Simple keyword-based analysis over the response's words, scanned once
+        words = set(_WORD_RE.findall(response.lower()))
         
-        return triggers
+        return {
+            "gestures": [name for name, keys in cls._GESTURE_TRIGGERS.items() if not keys.isdisjoint(words)],
+            "facial_expressions": [name for name, keys in cls._EXPRESSION_TRIGGERS.items() if not keys.isdisjoint(words)],
+            "body_movements": [name for name, keys in cls._MOVEMENT_TRIGGERS.items() if not keys.isdisjoint(words)]
+        }
     
     @classmethod
     def _generate_demo_response(cls, user_input: str) -> str:
         """Generate a demo response when API is not available"""
-        user_input_lower = user_input.lower()
-        
-        if "hello" in user_input_lower or "hi" in user_input_lower:
-            return "Hello! I'm your virtual tutor. I'm currently running in demo mode. How can I help you learn today?"
-        elif "math" in user_input_lower or "calculate" in user_input_lower:
-            return "I'd be happy to help you with math! In demo mode, I can explain concepts and provide examples. What specific math topic would you like to explore?"
-        elif "science" in user_input_lower:
-            return "Science is fascinating! I can help explain scientific concepts, theories, and discoveries. What area of science interests you?"
-        elif "history" in user_input_lower:
-            return "History is full of amazing stories and lessons! I can help you explore different historical periods and events. What would you like to learn about?"
-        elif "help" in user_input_lower:
-            return "I'm here to help you learn! I can assist with various subjects like math, science, history, language arts, and more. What would you like to study?"
-        else:
-            return f"That's an interesting question about '{user_input}'! I'm currently running in demo mode, but I'd be happy to help you learn about this topic. Could you tell me more about what specifically you'd like to know?"
+        # One scan for every keyword; the earliest topic in _DEMO_RESPONSES wins
+        matched = {match.group(1) for match in cls._DEMO_PATTERN.finditer(user_input.lower())}
+        for keywords, response in cls._DEMO_RESPONSES:
+            if not keywords.isdisjoint(matched):
+                return response
+        return cls._DEMO_DEFAULT_RESPONSE.format(user_input=user_input)
     
     @classmethod
-    def get_conversation_history(cls) -> List[Dict[str, str]]:
-        """Get conversation history"""
-        return cls._conversation_history.copy()
+    def get_conversation_history(cls, session_id: Optional[str] = None) -> Tuple[Dict[str, str], ...]:
+        """Get conversation history for a session"""
+        return tuple(cls._conversation_history.get(session_id or cls.DEFAULT_SESSION, ()))
     
     @classmethod
-    def clear_conversation_history(cls):
-        """Clear conversation history"""
-        cls._conversation_history.clear()
-        logger.info("Conversation history cleared") 
\ No newline at end of file
+    def record_turn(cls, session_id: Optional[str], user_input: str, response: str):
+        """Add a turn answered without the model (e.g. from a response cache) to a session's history"""
+        cls._update_conversation_history(session_id or cls.DEFAULT_SESSION, user_input, response)
+    
+    @classmethod
+    def clear_conversation_history(cls, session_id: Optional[str] = None):
+        """Clear conversation history for one session, or for all sessions"""
+        if session_id is None:
+            cls._conversation_history.clear()
+            logger.info("Conversation history cleared")
+        else:
+            cls._conversation_history.pop(session_id, None)
+            logger.info(f"Conversation history cleared for session {session_id}")
\ No newline at end of file
@@ -5,19 +5,28 @@ A FastAPI-based backend for AI-powered virtual human interactions
 
 import logging
 import asyncio
+import sys
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
 from core.config import settings
 from core.llm_service import LLMService
 from core.audio_service import AudioService
 from core.animation_service import AnimationService
+from core.history_store import HistoryStore
 
 # Import API routers
 from api.routes import chat, audio, animation, avatar
+from api.responses import ErrorResponseMiddleware, ORJSONResponse, make_json_response
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -67,6 +76,9 @@ async def lifespan(app: FastAPI):
             logger.info("Animation service will run in demo mode")
             animation_service = None
         
+        # Chat history falls back to in-process storage when Redis is unreachable
+        await HistoryStore.initialize()
+        
         logger.info("Virtual Human API startup completed")
         
     except Exception as e:
@@ -84,6 +96,7 @@ async def lifespan(app: FastAPI):
             await AudioService.cleanup()
         if animation_service:
             await AnimationService.cleanup()
+        await HistoryStore.cleanup()
         logger.info("All services cleaned up successfully")
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
@@ -93,9 +106,13 @@ app = FastAPI(
     title="Virtual Human API",
     description="AI-powered virtual human interaction system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Unhandled route errors become JSON 500s; added first so it sits inside CORS and its responses get the headers
+app.add_middleware(ErrorResponseMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -105,6 +122,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON responses; tiny payloads like /api/animation/status are left as-is
+if BrotliMiddleware:
+    # Serves br to clients that accept it and falls back to gzip otherwise
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=512)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # Include API routers
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
 app.include_router(audio.router, prefix="/api/audio", tags=["audio"])
@@ -114,7 +138,7 @@ app.include_router(avatar.router, prefix="/api/avatar", tags=["avatar"])
 @app.get("/")
 async def root():
     """Root endpoint"""
-    return {
+    return make_json_response({
         "message": "Virtual Human API",
         "version": "1.0.0",
         "status": "running",
@@ -123,24 +147,24 @@ async def root():
             "audio": "available" if audio_service else "demo_mode",
             "animation": "available" if animation_service else "demo_mode"
         }
-    }
+    })
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {
+    return make_json_response({
         "status": "healthy",
         "services": {
             "llm": "healthy" if llm_service and LLMService.is_healthy() else "unavailable",
             "audio": "healthy" if audio_service and AudioService.is_healthy() else "unavailable",
             "animation": "healthy" if animation_service and AnimationService.is_healthy() else "unavailable"
         }
-    }
+    })
 
 @app.get("/api/status")
 async def api_status():
     """Detailed API status"""
-    return {
+    return make_json_response({
         "api": "Virtual Human API",
         "version": "1.0.0",
         "status": "running",
@@ -158,12 +182,15 @@ async def api_status():
                 "health": "healthy" if animation_service and AnimationService.is_healthy() else "unavailable"
             }
         }
-    }
+    })
 
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host=settings.server.host,
         port=settings.server.port,
-        reload=True
+        reload=True,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        ws_per_message_deflate=True
     ) 
\ No newline at end of file
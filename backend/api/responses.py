@@ -0,0 +1,16 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+# numpy scalars (MediaPipe blendshape weights) and non-str dict keys encode natively
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def json_dumps(data: Any) -> bytes:
+    """Serialize data to JSON bytes with orjson"""
+    return orjson.dumps(data, option=ORJSON_OPTIONS)
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of the stdlib encoder"""
+    
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
\ No newline at end of file
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-import json
+from typing import Optional, List, Dict, Any, Union
+import asyncio
 import logging
+import numpy as np
+from api.responses import json_dumps
+from api.websocket import INBOX_SIZE, OUTBOX_SIZE, accept_websocket, decode_frame, error_reply, pump_frames, next_batch, write_frames
 from core.animation_service import AnimationService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class AnimationRequest(BaseModel):
-    """Animation request model"""
-    blendshapes: Dict[str, float]
+    """Animation request model, blendshapes keyed by name or as weights in ARKit order"""
+    blendshapes: Union[Dict[str, float], List[float]]
     gestures: List[str] = []
     emotion: str = "neutral"
     duration: float = 1.0
@@ -21,13 +24,52 @@ class BlendshapeInfo(BaseModel):
     value: float
     category: str
 
+# Blendshape name fragment -> category, checked in order; anything unmatched is "other"
+_CATEGORY_KEYWORDS = (
+    ("eye", "eyes"),
+    ("mouth", "mouth"),
+    ("brow", "brows"),
+    ("cheek", "cheeks"),
+    ("jaw", "jaw"),
+    ("nose", "nose"),
+    ("tongue", "tongue")
+)
+
+def _categorize(blendshape: str) -> str:
+    """Categorize a blendshape by its name"""
+    name = blendshape.lower()
+    return next((category for keyword, category in _CATEGORY_KEYWORDS if keyword in name), "other")
+
+# The blendshape list is static, so its response body is serialized once at import
+_BLENDSHAPES_RESPONSE = json_dumps([
+    BlendshapeInfo(name=blendshape, value=0.0, category=_categorize(blendshape)).model_dump()
+    for blendshape in AnimationService.ARKIT_BLENDSHAPES
+])
+
+def _unpack_blendshapes(packed: bytes) -> np.ndarray:
+    """View little-endian float32 weights sent in ARKIT_BLENDSHAPES order (MessagePack clients)"""
+    weights = np.frombuffer(packed, dtype="<f4")
+    if len(weights) > len(AnimationService.ARKIT_BLENDSHAPES):
+        raise ValueError(f"Expected at most {len(AnimationService.ARKIT_BLENDSHAPES)} blendshape weights")
+    return weights
+
 @router.post("/update")
 async def update_animation(request: AnimationRequest):
     """Update avatar animation"""
+    # Don't build an animation Unity can't receive
+    if not await AnimationService.ensure_unity_connection():
+        raise HTTPException(status_code=503, detail="Unity not connected")
+    
+    blendshapes = request.blendshapes
+    if isinstance(blendshapes, list):
+        if len(blendshapes) > len(AnimationService.ARKIT_BLENDSHAPES):
+            raise HTTPException(status_code=400, detail=f"Expected at most {len(AnimationService.ARKIT_BLENDSHAPES)} blendshape weights")
+        blendshapes = AnimationService.blendshapes_from_weights(blendshapes)
+    
     try:
         # Create animation data
         animation_data = await AnimationService.create_complete_animation(
-            blendshapes=request.blendshapes,
+            blendshapes=blendshapes,
             gestures=request.gestures,
             emotion=request.emotion
         )
@@ -43,6 +85,8 @@ async def update_animation(request: AnimationRequest):
             "animation_data": animation_data
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Animation update error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -50,42 +94,15 @@ async def update_animation(request: AnimationRequest):
 @router.get("/blendshapes")
 async def get_available_blendshapes():
     """Get available blendshapes"""
-    try:
-        blendshapes = []
-        
-        for blendshape in AnimationService.ARKIT_BLENDSHAPES:
-            # Categorize blendshapes
-            category = "other"
-            if "eye" in blendshape.lower():
-                category = "eyes"
-            elif "mouth" in blendshape.lower():
-                category = "mouth"
-            elif "brow" in blendshape.lower():
-                category = "brows"
-            elif "cheek" in blendshape.lower():
-                category = "cheeks"
-            elif "jaw" in blendshape.lower():
-                category = "jaw"
-            elif "nose" in blendshape.lower():
-                category = "nose"
-            elif "tongue" in blendshape.lower():
-                category = "tongue"
-            
-            blendshapes.append(BlendshapeInfo(
-                name=blendshape,
-                value=0.0,
-                category=category
-            ))
-        
-        return blendshapes
-        
-    except Exception as e:
-        logger.error(f"Error getting blendshapes: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=_BLENDSHAPES_RESPONSE, media_type="application/json")
 
 @router.post("/gesture")
 async def trigger_gesture(gesture_type: str, intensity: float = 1.0):
     """Trigger a specific gesture"""
+    # Don't build a gesture Unity can't receive
+    if not await AnimationService.ensure_unity_connection():
+        raise HTTPException(status_code=503, detail="Unity not connected")
+    
     try:
         # Create gesture animation
         gesture_data = await AnimationService.create_gesture_animation(
@@ -104,6 +121,8 @@ async def trigger_gesture(gesture_type: str, intensity: float = 1.0):
             "gesture_data": gesture_data
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Gesture trigger error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -126,73 +145,102 @@ async def get_animation_status():
         logger.error(f"Error getting animation status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _handle_animation_update(animation_data: Dict[str, Any], updates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Queue an update; the batch's updates are coalesced into a single Unity frame"""
+    blendshapes = animation_data.get("blendshapes")
+    if isinstance(blendshapes, bytes):
+        animation_data["blendshapes"] = _unpack_blendshapes(blendshapes)
+    elif isinstance(blendshapes, list) and len(blendshapes) > len(AnimationService.ARKIT_BLENDSHAPES):
+        raise ValueError(f"Expected at most {len(AnimationService.ARKIT_BLENDSHAPES)} blendshape weights")
+    updates.append(animation_data)
+    return None
+
+async def _handle_gesture_trigger(animation_data: Dict[str, Any], updates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Trigger a gesture and return its confirmation"""
+    # Only build the gesture if Unity can receive it
+    success = await AnimationService.ensure_unity_connection()
+    if success:
+        gesture_data = await AnimationService.create_gesture_animation(
+            gesture_type=animation_data.get("gesture_type", "wave"),
+            intensity=animation_data.get("intensity", 1.0)
+        )
+        
+        # Send to Unity
+        success = await AnimationService.send_animation_data(gesture_data)
+    
+    return {
+        "type": "gesture_confirmation",
+        "success": success,
+        "gesture_type": animation_data.get("gesture_type"),
+        "timestamp": animation_data.get("timestamp", 0)
+    }
+
+# WebSocket message type -> handler returning the reply to send, if any
+_MESSAGE_HANDLERS = {
+    "animation_update": _handle_animation_update,
+    "gesture_trigger": _handle_gesture_trigger
+}
+
 @router.websocket("/ws")
 async def animation_websocket(websocket: WebSocket):
     """WebSocket endpoint for real-time animation updates"""
-    await websocket.accept()
+    use_msgpack = await accept_websocket(websocket)
+    
+    # Frames are received in the background so each pass can handle everything queued since the last one
+    inbox = asyncio.Queue(maxsize=INBOX_SIZE)
+    receiver = asyncio.create_task(pump_frames(websocket, inbox))
+    # Replies are queued for a single writer so handling never waits on the socket
+    outbox = asyncio.Queue(maxsize=OUTBOX_SIZE)
+    writer = asyncio.create_task(write_frames(websocket, outbox, use_msgpack))
     
     try:
         while True:
-            # Receive animation data from client
-            data = await websocket.receive_text()
-            animation_data = json.loads(data)
+            # Block for the first message, then drain whatever else arrived meanwhile
+            batch = [decode_frame(data, use_msgpack) for data in await next_batch(inbox)]
+            updates = []
+            
+            for animation_data in batch:
+                try:
+                    # Process animation request
+                    handler = _MESSAGE_HANDLERS.get(animation_data.get("type"))
+                    if handler is None:
+                        # Unknown message type
+                        response = error_reply(f"Unknown message type: {animation_data.get('type')}")
+                    else:
+                        response = await handler(animation_data, updates)
+                    
+                    if response is not None:
+                        outbox.put_nowait(response)
+                        
+                except Exception as e:
+                    outbox.put_nowait(error_reply(str(e)))
+            
+            if not updates:
+                continue
             
             try:
-                # Process animation request
-                if animation_data["type"] == "animation_update":
-                    # Create complete animation
+                # Only build the animation if Unity can receive it
+                success = await AnimationService.ensure_unity_connection()
+                if success:
+                    # Merge every pending update (blendshapes last-wins) into one complete animation
                     complete_animation = await AnimationService.create_complete_animation(
-                        blendshapes=animation_data.get("blendshapes", {}),
-                        gestures=animation_data.get("gestures", []),
-                        emotion=animation_data.get("emotion", "neutral")
+                        **AnimationService.merge_animation_updates(updates)
                     )
                     
                     # Send to Unity
                     success = await AnimationService.send_animation_data(complete_animation)
-                    
-                    # Send confirmation back to client
-                    response = {
-                        "type": "animation_confirmation",
-                        "success": success,
-                        "timestamp": animation_data.get("timestamp", 0)
-                    }
-                    
-                    await websocket.send_text(json.dumps(response))
-                    
-                elif animation_data["type"] == "gesture_trigger":
-                    # Trigger gesture
-                    gesture_data = await AnimationService.create_gesture_animation(
-                        gesture_type=animation_data.get("gesture_type", "wave"),
-                        intensity=animation_data.get("intensity", 1.0)
-                    )
-                    
-                    # Send to Unity
-                    success = await AnimationService.send_animation_data(gesture_data)
-                    
-                    # Send confirmation back to client
-                    response = {
-                        "type": "gesture_confirmation",
-                        "success": success,
-                        "gesture_type": animation_data.get("gesture_type"),
-                        "timestamp": animation_data.get("timestamp", 0)
-                    }
-                    
-                    await websocket.send_text(json.dumps(response))
-                    
-                else:
-                    # Unknown message type
-                    response = {
-                        "type": "error",
-                        "error": f"Unknown message type: {animation_data.get('type')}"
-                    }
-                    await websocket.send_text(json.dumps(response))
-                    
-            except Exception as e:
-                error_response = {
-                    "type": "error",
-                    "error": str(e)
+                
+                # One confirmation for the whole batch, carrying the latest timestamp
+                response = {
+                    "type": "animation_confirmation",
+                    "success": success,
+                    "timestamp": updates[-1].get("timestamp", 0)
                 }
-                await websocket.send_text(json.dumps(error_response))
+                
+                outbox.put_nowait(response)
+                
+            except Exception as e:
+                outbox.put_nowait(error_reply(str(e)))
                 
     except WebSocketDisconnect:
         logger.info("Animation WebSocket disconnected")
@@ -201,4 +249,7 @@ async def animation_websocket(websocket: WebSocket):
         try:
             await websocket.close()
         except:
-            pass 
\ No newline at end of file
+            pass
+    finally:
+        receiver.cancel()
+        writer.cancel()
\ No newline at end of file
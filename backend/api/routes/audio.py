@@ -1,9 +1,7 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Response, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import logging
-import io
 from core.audio_service import AudioService
 
 logger = logging.getLogger(__name__)
@@ -31,17 +29,14 @@ async def speech_to_text(
     prompt: Optional[str] = Form(None)
 ):
     """Convert speech to text using OpenAI Whisper"""
+    # Validate file type before touching the upload
+    if not (audio_file.content_type or "").startswith("audio/"):
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
     try:
-        # Validate file type
-        if not audio_file.content_type.startswith("audio/"):
-            raise HTTPException(status_code=400, detail="File must be an audio file")
-        
-        # Read audio data
-        audio_data = await audio_file.read()
-        
-        # Process speech to text
+        # Process speech to text straight from the spooled upload
         result = await AudioService.speech_to_text(
-            audio_data=audio_data,
+            audio_data=audio_file.file,
             language=language,
             prompt=prompt
         )
@@ -63,11 +58,9 @@ async def text_to_speech(request: AudioRequest):
             emotion=request.emotion
         )
         
-        # Return audio as streaming response
-        audio_stream = io.BytesIO(audio_result["audio_data"])
-        
-        return StreamingResponse(
-            audio_stream,
+        # The audio is already in memory, so send it as-is rather than re-chunking a copy
+        return Response(
+            content=audio_result["audio_data"],
             media_type="audio/wav",
             headers={
                 "Content-Disposition": "attachment; filename=response.wav",
@@ -106,16 +99,13 @@ async def analyze_audio_emotion(
     audio_file: UploadFile = File(...)
 ):
     """Analyze audio to detect emotional content"""
+    # Validate file type before touching the upload
+    if not (audio_file.content_type or "").startswith("audio/"):
+        raise HTTPException(status_code=400, detail="File must be an audio file")
+    
     try:
-        # Validate file type
-        if not audio_file.content_type.startswith("audio/"):
-            raise HTTPException(status_code=400, detail="File must be an audio file")
-        
-        # Read audio data
-        audio_data = await audio_file.read()
-        
-        # Analyze audio emotion
-        emotion_data = await AudioService.analyze_audio_emotion(audio_data)
+        # Analyze audio emotion straight from the spooled upload
+        emotion_data = await AudioService.analyze_audio_emotion(audio_file.file)
         
         return emotion_data
         
@@ -138,16 +128,14 @@ async def stream_audio(
             emotion=emotion
         )
         
-        # Return audio as streaming response
-        audio_stream = io.BytesIO(audio_result["audio_data"])
-        
-        return StreamingResponse(
-            audio_stream,
+        # The audio is already in memory, so send it as-is rather than re-chunking a copy
+        return Response(
+            content=audio_result["audio_data"],
             media_type="audio/wav",
             headers={
                 "Content-Disposition": "inline; filename=stream.wav",
                 "X-Emotion": audio_result["emotion"],
-                "X-Voice-Settings": str(audio_result["voice_settings"])
+                "X-Voice-Settings": audio_result["voice_settings_header"]
             }
         )
         
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import logging
 import json
 import os
+from api.responses import json_dumps
 from core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -72,47 +73,35 @@ DEFAULT_AVATARS = {
     }
 }
 
+def _build_preset(preset_id: str, preset_data: Dict[str, Any]) -> AvatarPreset:
+    """Build a preset model from its DEFAULT_AVATARS entry"""
+    return AvatarPreset(
+        preset_id=preset_id,
+        name=preset_data["name"],
+        description=f"Pre-configured {preset_data['name'].lower()}",
+        config=AvatarConfig(**preset_data)
+    )
+
+# The presets are static, so they are validated and serialized once at import
+_PRESET_RESPONSES = {
+    preset_id: json_dumps(_build_preset(preset_id, preset_data).model_dump())
+    for preset_id, preset_data in DEFAULT_AVATARS.items()
+}
+_PRESETS_RESPONSE = b"[" + b",".join(_PRESET_RESPONSES.values()) + b"]"
+
 @router.get("/presets", response_model=List[AvatarPreset])
 async def get_avatar_presets():
     """Get available avatar presets"""
-    try:
-        presets = []
-        
-        for preset_id, preset_data in DEFAULT_AVATARS.items():
-            preset = AvatarPreset(
-                preset_id=preset_id,
-                name=preset_data["name"],
-                description=f"Pre-configured {preset_data['name'].lower()}",
-                config=AvatarConfig(**preset_data)
-            )
-            presets.append(preset)
-        
-        return presets
-        
-    except Exception as e:
-        logger.error(f"Error getting avatar presets: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=_PRESETS_RESPONSE, media_type="application/json")
 
 @router.get("/presets/{preset_id}", response_model=AvatarPreset)
 async def get_avatar_preset(preset_id: str):
     """Get a specific avatar preset"""
-    try:
-        if preset_id not in DEFAULT_AVATARS:
-            raise HTTPException(status_code=404, detail="Avatar preset not found")
-        
-        preset_data = DEFAULT_AVATARS[preset_id]
-        preset = AvatarPreset(
-            preset_id=preset_id,
-            name=preset_data["name"],
-            description=f"Pre-configured {preset_data['name'].lower()}",
-            config=AvatarConfig(**preset_data)
-        )
-        
-        return preset
-        
-    except Exception as e:
-        logger.error(f"Error getting avatar preset: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    body = _PRESET_RESPONSES.get(preset_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Avatar preset not found")
+    
+    return Response(content=body, media_type="application/json")
 
 @router.post("/create")
 async def create_custom_avatar(config: AvatarConfig):
@@ -171,85 +160,75 @@ async def delete_avatar(avatar_id: str):
         logger.error(f"Error deleting avatar: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# In a real implementation, you'd scan a models directory
+# For now, we'll return some example models, serialized once at import
+_MODELS_RESPONSE = json_dumps([
+    {
+        "model_id": "default_avatar",
+        "name": "Default Avatar",
+        "path": "models/default_avatar.fbx",
+        "type": "humanoid",
+        "polygon_count": "10k-50k",
+        "texture_resolution": "2048x2048"
+    },
+    {
+        "model_id": "teacher_avatar",
+        "name": "Teacher Avatar",
+        "path": "models/teacher_avatar.fbx",
+        "type": "humanoid",
+        "polygon_count": "15k-75k",
+        "texture_resolution": "4096x4096"
+    },
+    {
+        "model_id": "assistant_avatar",
+        "name": "Assistant Avatar",
+        "path": "models/assistant_avatar.fbx",
+        "type": "humanoid",
+        "polygon_count": "12k-60k",
+        "texture_resolution": "2048x2048"
+    }
+])
+
 @router.get("/models")
 async def get_available_models():
     """Get available 3D avatar models"""
-    try:
-        # In a real implementation, you'd scan a models directory
-        # For now, we'll return some example models
-        
-        models = [
-            {
-                "model_id": "default_avatar",
-                "name": "Default Avatar",
-                "path": "models/default_avatar.fbx",
-                "type": "humanoid",
-                "polygon_count": "10k-50k",
-                "texture_resolution": "2048x2048"
-            },
-            {
-                "model_id": "teacher_avatar",
-                "name": "Teacher Avatar",
-                "path": "models/teacher_avatar.fbx",
-                "type": "humanoid",
-                "polygon_count": "15k-75k",
-                "texture_resolution": "4096x4096"
-            },
-            {
-                "model_id": "assistant_avatar",
-                "name": "Assistant Avatar",
-                "path": "models/assistant_avatar.fbx",
-                "type": "humanoid",
-                "polygon_count": "12k-60k",
-                "texture_resolution": "2048x2048"
-            }
-        ]
-        
-        return models
-        
-    except Exception as e:
-        logger.error(f"Error getting available models: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=_MODELS_RESPONSE, media_type="application/json")
+
+# Personality templates, serialized once at import like the models above
+_PERSONALITIES_RESPONSE = json_dumps([
+    {
+        "id": "friendly",
+        "name": "Friendly",
+        "description": "Warm, approachable, and easy to talk to",
+        "template": "You are a friendly and welcoming person. You smile often, use positive language, and make people feel comfortable in conversation."
+    },
+    {
+        "id": "professional",
+        "name": "Professional",
+        "description": "Formal, knowledgeable, and business-like",
+        "template": "You are a professional and knowledgeable expert. You speak clearly, provide accurate information, and maintain a helpful but formal demeanor."
+    },
+    {
+        "id": "enthusiastic",
+        "name": "Enthusiastic",
+        "description": "Energetic, passionate, and engaging",
+        "template": "You are enthusiastic and passionate about helping others. You use expressive language, show excitement, and engage people with your energy."
+    },
+    {
+        "id": "calm",
+        "name": "Calm",
+        "description": "Relaxed, patient, and soothing",
+        "template": "You are calm and patient. You speak slowly and clearly, provide thoughtful responses, and create a peaceful atmosphere."
+    },
+    {
+        "id": "humorous",
+        "name": "Humorous",
+        "description": "Funny, witty, and entertaining",
+        "template": "You are humorous and entertaining. You use wit and humor appropriately, make people laugh, and keep conversations engaging and fun."
+    }
+])
 
 @router.get("/personalities")
 async def get_personality_templates():
     """Get personality templates for avatars"""
-    try:
-        personalities = [
-            {
-                "id": "friendly",
-                "name": "Friendly",
-                "description": "Warm, approachable, and easy to talk to",
-                "template": "You are a friendly and welcoming person. You smile often, use positive language, and make people feel comfortable in conversation."
-            },
-            {
-                "id": "professional",
-                "name": "Professional",
-                "description": "Formal, knowledgeable, and business-like",
-                "template": "You are a professional and knowledgeable expert. You speak clearly, provide accurate information, and maintain a helpful but formal demeanor."
-            },
-            {
-                "id": "enthusiastic",
-                "name": "Enthusiastic",
-                "description": "Energetic, passionate, and engaging",
-                "template": "You are enthusiastic and passionate about helping others. You use expressive language, show excitement, and engage people with your energy."
-            },
-            {
-                "id": "calm",
-                "name": "Calm",
-                "description": "Relaxed, patient, and soothing",
-                "template": "You are calm and patient. You speak slowly and clearly, provide thoughtful responses, and create a peaceful atmosphere."
-            },
-            {
-                "id": "humorous",
-                "name": "Humorous",
-                "description": "Funny, witty, and entertaining",
-                "template": "You are humorous and entertaining. You use wit and humor appropriately, make people laugh, and keep conversations engaging and fun."
-            }
-        ]
-        
-        return personalities
-        
-    except Exception as e:
-        logger.error(f"Error getting personality templates: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+    return Response(content=_PERSONALITIES_RESPONSE, media_type="application/json")
\ No newline at end of file
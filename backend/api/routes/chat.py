@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
-import json
+import asyncio
 import logging
+from api.responses import json_dumps
+from api.websocket import INBOX_SIZE, OUTBOX_SIZE, STREAM_LINGER, accept_websocket, decode_frame, error_reply, pump_frames, next_batch, write_frames
 from core.llm_service import LLMService
 from core.audio_service import AudioService
 from core.animation_service import AnimationService
@@ -34,9 +37,32 @@ class SessionInfo(BaseModel):
     created_at: float
     last_activity: float
 
+async def _response_events(request: ChatRequest):
+    """Relay the streamed LLM reply as server-sent events, ending with the complete response"""
+    try:
+        async for event in LLMService.stream_response(
+            user_input=request.message,
+            session_id=request.session_id,
+            context=request.context,
+            personality=request.personality
+        ):
+            if "response" in event:
+                # Complete the LLM's animation data in place and send it to Unity without waiting
+                event["animation"] = AnimationService.finalize_animation(event["animation"])
+                AnimationService.send_animation_data_in_background(event["animation"])
+            yield b"data: " + json_dumps(event) + b"\n\n"
+    except Exception as e:
+        # The status line has already gone out, so the failure is reported in the stream
+        logger.error(f"Error in chat stream: {e}")
+        yield b"data: " + json_dumps({"error": str(e)}) + b"\n\n"
+
 @router.post("/send", response_model=ChatResponse)
-async def send_message(request: ChatRequest):
+async def send_message(request: ChatRequest, background_tasks: BackgroundTasks, http_request: Request):
     """Send a message to the virtual human"""
+    # Streaming clients get the reply as it is generated, so speech and animation can start on the first words
+    if "text/event-stream" in http_request.headers.get("accept", ""):
+        return StreamingResponse(_response_events(request), media_type="text/event-stream")
+    
     try:
         # Generate LLM response
         llm_result = await LLMService.generate_response(
@@ -46,15 +72,11 @@ async def send_message(request: ChatRequest):
             personality=request.personality
         )
         
-        # Create animation data
-        animation_data = await AnimationService.create_complete_animation(
-            blendshapes=llm_result["animation"].get("blendshapes", {}),
-            gestures=llm_result["animation"].get("gestures", []),
-            emotion=llm_result["animation"].get("emotion", "neutral")
-        )
+        # Complete the LLM's animation data in place for Unity
+        animation_data = AnimationService.finalize_animation(llm_result["animation"])
         
-        # Send animation to Unity if connected
-        await AnimationService.send_animation_data(animation_data)
+        # Send animation to Unity if connected, once the response is out
+        background_tasks.add_task(AnimationService.send_animation_data, animation_data)
         
         # Generate audio if requested
         audio_url = None
@@ -82,31 +104,14 @@ async def send_message(request: ChatRequest):
 @router.get("/sessions", response_model=List[SessionInfo])
 async def get_sessions():
     """Get all active chat sessions"""
-    try:
-        session_ids = LLMService.get_all_session_ids()
-        sessions = []
-        
-        for session_id in session_ids:
-            history = LLMService.get_conversation_history(session_id)
-            if history:
-                sessions.append(SessionInfo(
-                    session_id=session_id,
-                    message_count=len(history),
-                    created_at=history[0]["timestamp"] if history else 0,
-                    last_activity=history[-1]["timestamp"] if history else 0
-                ))
-        
-        return sessions
-        
-    except Exception as e:
-        logger.error(f"Error getting sessions: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Already shaped like SessionInfo, so it is serialized without per-item validation
+    return Response(content=json_dumps(await LLMService.get_session_summaries()), media_type="application/json")
 
 @router.get("/history/{session_id}")
 async def get_conversation_history(session_id: str):
     """Get conversation history for a specific session"""
     try:
-        history = LLMService.get_conversation_history(session_id)
+        history = await LLMService.get_conversation_history(session_id)
         return {"session_id": session_id, "history": history}
         
     except Exception as e:
@@ -117,7 +122,7 @@ async def get_conversation_history(session_id: str):
 async def clear_session(session_id: str):
     """Clear conversation history for a session"""
     try:
-        LLMService.clear_conversation_history(session_id)
+        await LLMService.clear_conversation_history(session_id)
         return {"message": f"Session {session_id} cleared successfully"}
         
     except Exception as e:
@@ -127,50 +132,60 @@ async def clear_session(session_id: str):
 @router.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time chat"""
-    await websocket.accept()
+    use_msgpack = await accept_websocket(websocket)
+    
+    # Frames are received in the background so each pass can handle everything queued since the last one
+    inbox = asyncio.Queue(maxsize=INBOX_SIZE)
+    receiver = asyncio.create_task(pump_frames(websocket, inbox))
+    # Replies are queued for a single writer so handling never waits on the socket. MessagePack clients
+    # take batched frames, so their writer lingers briefly to send a streamed reply's chunks a few per frame;
+    # JSON clients get one reply per frame, where lingering would only add delay
+    outbox = asyncio.Queue(maxsize=OUTBOX_SIZE)
+    writer = asyncio.create_task(write_frames(websocket, outbox, use_msgpack, linger=STREAM_LINGER if use_msgpack else 0.0))
     
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            # Block for the first message, then drain whatever else arrived meanwhile
+            batch = [decode_frame(data, use_msgpack) for data in await next_batch(inbox)]
+            animations = []
             
-            # Process message
-            try:
-                llm_result = await LLMService.generate_response(
-                    user_input=message_data["message"],
-                    session_id=session_id,
-                    context=message_data.get("context"),
-                    personality=message_data.get("personality")
-                )
-                
-                # Create animation data
-                animation_data = await AnimationService.create_complete_animation(
-                    blendshapes=llm_result["animation"].get("blendshapes", {}),
-                    gestures=llm_result["animation"].get("gestures", []),
-                    emotion=llm_result["animation"].get("emotion", "neutral")
+            for message_data in batch:
+                # Process message
+                try:
+                    # Forward the reply as it is generated; the last event is the complete result
+                    async for llm_result in LLMService.stream_response(
+                        user_input=message_data["message"],
+                        session_id=session_id,
+                        context=message_data.get("context"),
+                        personality=message_data.get("personality")
+                    ):
+                        if "delta" in llm_result:
+                            outbox.put_nowait({"type": "chat_delta", "delta": llm_result["delta"]})
+                    
+                    # Complete the LLM's animation data in place for Unity
+                    animation_data = AnimationService.finalize_animation(llm_result["animation"])
+                    animations.append(animation_data)
+                    
+                    # Send response back to client
+                    response = {
+                        "type": "chat_response",
+                        "response": llm_result["response"],
+                        "animation": animation_data,
+                        "timestamp": llm_result["timestamp"]
+                    }
+                    
+                    outbox.put_nowait(response)
+                    
+                except Exception as e:
+                    outbox.put_nowait(error_reply(str(e)))
+            
+            # Send the batch's animations to Unity as one merged frame, without waiting on it
+            if animations:
+                merged = AnimationService.merge_animation_updates(animations)
+                AnimationService.send_animation_data_in_background(
+                    AnimationService.finalize_animation(merged)
                 )
                 
-                # Send animation to Unity
-                await AnimationService.send_animation_data(animation_data)
-                
-                # Send response back to client
-                response = {
-                    "type": "chat_response",
-                    "response": llm_result["response"],
-                    "animation": animation_data,
-                    "timestamp": llm_result["timestamp"]
-                }
-                
-                await websocket.send_text(json.dumps(response))
-                
-            except Exception as e:
-                error_response = {
-                    "type": "error",
-                    "error": str(e)
-                }
-                await websocket.send_text(json.dumps(error_response))
-                
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for session {session_id}")
     except Exception as e:
@@ -178,4 +193,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         try:
             await websocket.close()
         except:
-            pass 
\ No newline at end of file
+            pass
+    finally:
+        receiver.cancel()
+        writer.cancel()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Union
+import msgspec
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from api.responses import json_dumps
+
+logger = logging.getLogger(__name__)
+
+# Frames a client may have in flight before its receiver waits for the handler to catch up
+INBOX_SIZE = 256
+# Largest frame accepted from a client (uvicorn's ws_max_size enforces the same limit at the protocol level)
+MAX_FRAME_SIZE = 64 * 1024
+# Replies queued for a client before handlers give up on it as too slow
+OUTBOX_SIZE = 256
+# Most payloads merged into one outgoing frame
+WRITE_BATCH_MAX = 64
+# How long a MessagePack writer holds a batch open for more payloads when streaming (seconds)
+STREAM_LINGER = 0.01
+
+# Clients that offer this subprotocol exchange MessagePack binary frames instead of JSON text.
+# Each frame they receive is an array of one or more replies; JSON clients get one reply object per frame.
+MSGPACK_SUBPROTOCOL = "msgpack"
+_msgpack_encoder = msgspec.msgpack.Encoder()
+_msgpack_decoder = msgspec.msgpack.Decoder()
+
+Frame = Union[bytes, str]
+
+def error_reply(error: str) -> Dict[str, str]:
+    """Error reply for a client"""
+    return {"type": "error", "error": error}
+
+async def accept_websocket(websocket: WebSocket) -> bool:
+    """Accept the connection, agreeing to MessagePack if the client offers it; returns whether it did"""
+    use_msgpack = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if use_msgpack else None)
+    return use_msgpack
+
+def decode_frame(data: Frame, use_msgpack: bool) -> Any:
+    """Decode one received frame"""
+    if use_msgpack:
+        return _msgpack_decoder.decode(data)
+    # JSON may arrive in binary frames too (the Unity client sends them that way)
+    return orjson.loads(data)
+
+async def send_frame(websocket: WebSocket, data: Any, use_msgpack: bool):
+    """Encode data for the negotiated protocol and send it as one frame"""
+    if use_msgpack:
+        await websocket.send_bytes(_msgpack_encoder.encode(data))
+    else:
+        # Still a text frame for JSON clients; orjson's UTF-8 output decodes as-is
+        await websocket.send_text(json_dumps(data).decode())
+
+async def pump_frames(websocket: WebSocket, inbox: asyncio.Queue):
+    """Move incoming frames into inbox; the error that ends the connection is queued last"""
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            data = message.get("bytes")
+            if data is None:
+                data = message["text"]
+            
+            # Refuse oversized frames before anything tries to decode them
+            if len(data) > MAX_FRAME_SIZE:
+                await websocket.close(code=1009)
+                raise WebSocketDisconnect(1009)
+            await inbox.put(data)
+    except Exception as e:
+        await inbox.put(e)
+
+async def next_batch(inbox: asyncio.Queue) -> List[Frame]:
+    """Wait for one frame, then take every frame already queued behind it"""
+    batch: List[Union[Frame, Exception]] = [await inbox.get()]
+    while not inbox.empty():
+        batch.append(inbox.get_nowait())
+    
+    # The receiver has stopped: hand out the frames before the error, then raise it
+    if isinstance(batch[-1], Exception):
+        error = batch.pop()
+        if not batch:
+            raise error
+        inbox.put_nowait(error)
+    
+    return batch
+
+async def write_frames(websocket: WebSocket, outbox: asyncio.Queue, use_msgpack: bool, linger: float = 0.0):
+    """Send queued payloads: all pending ones as one list frame for MessagePack clients, one frame each for JSON clients"""
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            payloads = [await outbox.get()]
+            # With a linger, payloads arriving shortly after the first (streamed chunks) join its batch too
+            deadline = loop.time() + linger
+            while len(payloads) < WRITE_BATCH_MAX:
+                if not outbox.empty():
+                    payloads.append(outbox.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    payloads.append(await asyncio.wait_for(outbox.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            if use_msgpack:
+                await send_frame(websocket, payloads, use_msgpack)
+            else:
+                for payload in payloads:
+                    await send_frame(websocket, payload, use_msgpack)
+    except Exception as e:
+        # Close the socket so the handler sees the connection end instead of filling an outbox nobody drains
+        logger.warning(f"WebSocket writer stopped: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass
\ No newline at end of file
@@ -1,8 +1,12 @@
 import asyncio
+import base64
 import logging
-import json
+import math
+import time
+import orjson
 import websockets
-from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Sequence, Set, Tuple, Union
 import mediapipe as mp
 import cv2
 import numpy as np
@@ -10,14 +14,50 @@ from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+def _blendshape_arrays(names: Sequence[str], table: Dict[str, Dict[str, float]]) -> Dict[str, np.ndarray]:
+    """Turn named blendshape values into read-only weight arrays in names order"""
+    index = {name: position for position, name in enumerate(names)}
+    arrays = {}
+    for key, values in table.items():
+        weights = np.zeros(len(names))
+        for name, value in values.items():
+            weights[index[name]] = value
+        weights.setflags(write=False)
+        arrays[key] = weights
+    return arrays
+
 class AnimationService:
     """Service for managing avatar animation and Unity communication"""
     
     _initialized: bool = False
     _unity_websocket: Optional[websockets.WebSocketServerProtocol] = None
+    # After a failed connect, Unity is treated as down until this monotonic time instead of being retried per request
+    _unity_retry_at: float = 0.0
+    UNITY_RETRY_INTERVAL: float = 2.0
     _mediapipe_face_mesh: Optional[mp.solutions.face_mesh.FaceMesh] = None
     _mediapipe_hands: Optional[mp.solutions.hands.Hands] = None
     _mediapipe_pose: Optional[mp.solutions.pose.Pose] = None
+    # Tasks-API face landmarker (when a model is configured), fed strictly increasing video timestamps
+    _face_landmarker: Optional[mp.tasks.vision.FaceLandmarker] = None
+    _face_timestamp_ms: int = 0
+    # Last detected face (before the emotion overlay), reused between inference frames
+    _last_face_blendshapes: Optional[np.ndarray] = None
+    _face_frames_since_detection: int = 0
+    # MediaPipe graphs run off the event loop, one call at a time since they are not thread-safe
+    _inference_executor: Optional[ThreadPoolExecutor] = None
+    # Frames are shrunk to this longest side before inference; the face models run at 192-256 px anyway
+    FACE_INPUT_SIZE: int = 256
+    
+    # Unity sends scheduled off the request path, kept so cleanup can cancel them
+    _pending_sends: Set[asyncio.Task] = set()
+    MAX_PENDING_SENDS: int = 64
+    
+    # Frames for Unity are queued and flushed by one writer task, everything queued within a flush window per frame
+    _unity_queue: Optional[asyncio.Queue] = None
+    _unity_writer: Optional[asyncio.Task] = None
+    UNITY_QUEUE_SIZE: int = 256
+    UNITY_FLUSH_INTERVAL: float = 0.005
+    UNITY_PING_INTERVAL: float = 20.0
     
     # Standard ARKit blendshapes
     ARKIT_BLENDSHAPES = [
@@ -34,12 +74,113 @@ class AnimationService:
         "tongueOut", "tongueUp", "tongueDown", "tongueLeft", "tongueRight"
     ]
     
+    # Blendshapes are handled internally as weight arrays in ARKIT_BLENDSHAPES order and only named at the API boundary
+    _BS_INDEX: Dict[str, int] = {name: index for index, name in enumerate(ARKIT_BLENDSHAPES)}
+    _BS_ZERO = np.zeros(len(ARKIT_BLENDSHAPES))
+    _BS_ZERO.setflags(write=False)
+    
+    # Emotion-specific blendshape minimums
+    _EMOTION_MODIFIERS: Dict[str, Dict[str, float]] = {
+        "happy": {
+            "mouthSmile_L": 0.8,
+            "mouthSmile_R": 0.8,
+            "cheekSquint_L": 0.6,
+            "cheekSquint_R": 0.6,
+            "eyeWide_L": 0.3,
+            "eyeWide_R": 0.3
+        },
+        "sad": {
+            "mouthFrown_L": 0.7,
+            "mouthFrown_R": 0.7,
+            "browDown_L": 0.6,
+            "browDown_R": 0.6,
+            "eyeSquint_L": 0.4,
+            "eyeSquint_R": 0.4
+        },
+        "excited": {
+            "mouthSmile_L": 0.9,
+            "mouthSmile_R": 0.9,
+            "eyeWide_L": 0.8,
+            "eyeWide_R": 0.8,
+            "browInnerUp": 0.7,
+            "jawOpen": 0.3
+        },
+        "angry": {
+            "browDown_L": 0.8,
+            "browDown_R": 0.8,
+            "mouthFrown_L": 0.6,
+            "mouthFrown_R": 0.6,
+            "eyeSquint_L": 0.7,
+            "eyeSquint_R": 0.7
+        }
+    }
+    _EMOTION_ARRAYS: Dict[str, np.ndarray] = _blendshape_arrays(ARKIT_BLENDSHAPES, _EMOTION_MODIFIERS)
+    
+    # Blendshapes used when no face is available; any other emotion gets "neutral"
+    _EMOTION_DEFAULTS: Dict[str, np.ndarray] = _blendshape_arrays(ARKIT_BLENDSHAPES, {
+        "neutral": {},
+        "happy": {"mouthSmile_L": 0.5, "mouthSmile_R": 0.5},
+        "sad": {"mouthFrown_L": 0.5, "mouthFrown_R": 0.5},
+        "excited": {"eyeWide_L": 0.3, "eyeWide_R": 0.3}
+    })
+    
+    # FaceLandmarker category name -> position; MediaPipe spells the side out ("eyeBlinkLeft" for "eyeBlink_L")
+    _FACE_BLENDSHAPE_INDEX: Dict[str, int] = {
+        name[:-2] + ("Left" if name.endswith("_L") else "Right") if name.endswith(("_L", "_R")) else name: index
+        for index, name in enumerate(ARKIT_BLENDSHAPES)
+    }
+    
+    # Wire layout of a NormalizedLandmark holding only x, y, z: a length-delimited entry
+    # (tag 0x0a, length 15) wrapping three fixed32 floats (tags 0x0d, 0x15, 0x1d)
+    _LANDMARK_WIRE_DTYPE = np.dtype([
+        ("tag", "u1"), ("size", "u1"),
+        ("x_tag", "u1"), ("x", "<f4"),
+        ("y_tag", "u1"), ("y", "<f4"),
+        ("z_tag", "u1"), ("z", "<f4")
+    ])
+    
+    # Landmark index arrays (approximate indices), built once so each frame indexes without converting a list
+    _LEFT_EYE_IDX = np.array([33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246], dtype=np.int32)
+    _RIGHT_EYE_IDX = np.array([362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398], dtype=np.int32)
+    _MOUTH_IDX = np.arange(13, 33, dtype=np.int32)
+    _LEFT_EYE_IDX_MAX: int = int(_LEFT_EYE_IDX.max())
+    _RIGHT_EYE_IDX_MAX: int = int(_RIGHT_EYE_IDX.max())
+    _MOUTH_IDX_MAX: int = int(_MOUTH_IDX.max())
+    # The same indices in one gather, split into left eye / right eye / mouth segments for reduceat
+    _FEATURE_IDX = np.concatenate([_LEFT_EYE_IDX, _RIGHT_EYE_IDX, _MOUTH_IDX])
+    _FEATURE_SEGMENTS = np.array([0, len(_LEFT_EYE_IDX), len(_LEFT_EYE_IDX) + len(_RIGHT_EYE_IDX)])
+    _FEATURE_IDX_MAX: int = int(_FEATURE_IDX.max())
+    
+    # Gesture keyframes, built once rather than on every create_gesture_animation call
+    _GESTURE_ANIMATIONS: Dict[str, Dict[str, Any]] = {
+        "nod": {
+            "head_rotation_y": (0, 15, 0, -15, 0),
+            "duration": 1.0
+        },
+        "shake_head": {
+            "head_rotation_y": (0, -15, 0, 15, 0),
+            "duration": 1.0
+        },
+        "wave": {
+            "hand_rotation_z": (0, 45, -45, 45, 0),
+            "duration": 1.5
+        },
+        "point": {
+            "finger_extension": (0, 1, 1, 0),
+            "duration": 0.8
+        }
+    }
+    
     @classmethod
     async def initialize(cls):
         """Initialize the animation service"""
         try:
+            cls._inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mediapipe")
+            
             # Initialize MediaPipe components
-            if settings.mediapipe_face_mesh:
+            if settings.mediapipe_face_mesh and settings.mediapipe_face_landmarker_model:
+                cls._face_landmarker = cls._create_face_landmarker(settings.mediapipe_face_landmarker_model)
+            elif settings.mediapipe_face_mesh:
                 cls._mediapipe_face_mesh = mp.solutions.face_mesh.FaceMesh(
                     static_image_mode=False,
                     max_num_faces=1,
@@ -73,18 +214,60 @@ class AnimationService:
             logger.error(f"Failed to initialize animation service: {e}")
             raise
     
+    @classmethod
+    def _create_face_landmarker(cls, model_path: str) -> mp.tasks.vision.FaceLandmarker:
+        """Create a FaceLandmarker that outputs blendshapes, on the GPU delegate if it can be used"""
+        vision = mp.tasks.vision
+        delegate = mp.tasks.BaseOptions.Delegate
+        
+        for target in (delegate.GPU, delegate.CPU):
+            options = vision.FaceLandmarkerOptions(
+                base_options=mp.tasks.BaseOptions(model_asset_path=model_path, delegate=target),
+                # Video mode tracks the face from the previous frame instead of re-detecting it every call
+                running_mode=vision.RunningMode.VIDEO,
+                num_faces=1,
+                min_face_detection_confidence=0.5,
+                min_tracking_confidence=0.5,
+                output_face_blendshapes=True
+            )
+            try:
+                return vision.FaceLandmarker.create_from_options(options)
+            except Exception as e:
+                if target == delegate.CPU:
+                    raise
+                logger.warning(f"GPU delegate unavailable for face landmarker, falling back to CPU: {e}")
+    
     @classmethod
     async def cleanup(cls):
         """Cleanup the animation service"""
         try:
+            for task in cls._pending_sends:
+                task.cancel()
+            cls._pending_sends.clear()
+            
+            if cls._unity_writer:
+                cls._unity_writer.cancel()
+                cls._unity_writer = None
+            cls._unity_queue = None
+            
             if cls._unity_websocket:
                 await cls._unity_websocket.close()
                 cls._unity_websocket = None
             
+            # Let a running inference finish before its graph is closed
+            if cls._inference_executor:
+                await asyncio.to_thread(cls._inference_executor.shutdown, cancel_futures=True)
+                cls._inference_executor = None
+            
             if cls._mediapipe_face_mesh:
                 cls._mediapipe_face_mesh.close()
                 cls._mediapipe_face_mesh = None
             
+            if cls._face_landmarker:
+                cls._face_landmarker.close()
+                cls._face_landmarker = None
+            cls._last_face_blendshapes = None
+            
             if cls._mediapipe_hands:
                 cls._mediapipe_hands.close()
                 cls._mediapipe_hands = None
@@ -108,7 +291,19 @@ class AnimationService:
     async def connect_to_unity(cls) -> bool:
         """Connect to Unity via WebSocket"""
         try:
-            cls._unity_websocket = await websockets.connect(settings.unity_websocket_url)
+            # Keepalive pings detect a dead Unity end instead of letting frames pile up behind it
+            cls._unity_websocket = await websockets.connect(
+                settings.unity_websocket_url,
+                ping_interval=cls.UNITY_PING_INTERVAL,
+                ping_timeout=cls.UNITY_PING_INTERVAL
+            )
+            if settings.unity_quantize_blendshapes:
+                # Quantized frames carry bare weights, so Unity gets their order once per connection
+                await cls._unity_websocket.send(orjson.dumps({
+                    "type": "blendshape_layout",
+                    "blendshapes": cls.ARKIT_BLENDSHAPES,
+                    "scale": 255
+                }).decode())
             logger.info("Connected to Unity WebSocket")
             return True
         except Exception as e:
@@ -116,21 +311,100 @@ class AnimationService:
             return False
     
     @classmethod
-    async def send_animation_data(cls, animation_data: Dict[str, Any]) -> bool:
-        """Send animation data to Unity"""
-        if not cls._unity_websocket:
-            if not await cls.connect_to_unity():
-                return False
+    async def ensure_unity_connection(cls) -> bool:
+        """Connect to Unity if needed, failing fast while a recent attempt is backing off"""
+        if cls._unity_websocket:
+            return True
+        if time.monotonic() < cls._unity_retry_at:
+            return False
         
-        try:
-            message = json.dumps(animation_data)
-            await cls._unity_websocket.send(message)
+        if await cls.connect_to_unity():
             return True
-        except Exception as e:
-            logger.error(f"Failed to send animation data to Unity: {e}")
-            # Try to reconnect
-            cls._unity_websocket = None
+        cls._unity_retry_at = time.monotonic() + cls.UNITY_RETRY_INTERVAL
+        return False
+    
+    @classmethod
+    async def send_animation_data(cls, animation_data: Dict[str, Any]) -> bool:
+        """Queue animation data for Unity; returns False if Unity is unreachable"""
+        if not await cls.ensure_unity_connection():
             return False
+        
+        if cls._unity_writer is None or cls._unity_writer.done():
+            cls._unity_queue = asyncio.Queue(maxsize=cls.UNITY_QUEUE_SIZE)
+            cls._unity_writer = asyncio.create_task(cls._write_to_unity(cls._unity_queue))
+        
+        if cls._unity_queue.full():
+            # Unity is not keeping up; the oldest frame is the most stale
+            cls._unity_queue.get_nowait()
+        cls._unity_queue.put_nowait(animation_data)
+        return True
+    
+    @classmethod
+    async def _write_to_unity(cls, queue: asyncio.Queue):
+        """Flush queued frames to Unity, merging each flush window into one WebSocket message"""
+        while True:
+            frames = [await queue.get()]
+            await asyncio.sleep(cls.UNITY_FLUSH_INTERVAL)
+            while not queue.empty():
+                frames.append(queue.get_nowait())
+            
+            try:
+                if settings.unity_quantize_blendshapes:
+                    frames = [cls._quantize_blendshapes(frame) for frame in frames]
+                
+                # A lone frame goes out as-is, several as a list; orjson takes weight arrays as they are,
+                # and the JSON stays a text frame since that is what the Unity client reads
+                message = orjson.dumps(frames[0] if len(frames) == 1 else frames, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+            except Exception as e:
+                # A bad frame must not take the writer (and everything queued behind it) down
+                logger.error(f"Dropping {len(frames)} animation frame(s) that could not be encoded: {e}")
+                continue
+            
+            try:
+                if not cls._unity_websocket:
+                    raise ConnectionError("Unity not connected")
+                await cls._unity_websocket.send(message)
+            except Exception as e:
+                logger.error(f"Failed to send animation data to Unity: {e}")
+                # Drop the batch, close the broken socket and reconnect on the next send
+                websocket, cls._unity_websocket = cls._unity_websocket, None
+                if websocket:
+                    try:
+                        await websocket.close()
+                    except Exception:
+                        pass
+    
+    @classmethod
+    def _quantize_blendshapes(cls, animation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a Unity frame with its blendshapes as base64 uint8 weights; unnamed blendshapes are 0"""
+        blendshapes = animation_data.get("blendshapes")
+        if blendshapes is None:
+            return animation_data
+        
+        weights = cls._BS_ZERO.copy()
+        if isinstance(blendshapes, dict):
+            for name, value in blendshapes.items():
+                index = cls._BS_INDEX.get(name)
+                if index is not None:
+                    weights[index] = value
+        else:
+            weights[:len(blendshapes)] = blendshapes
+        
+        quantized = np.rint(np.clip(weights, 0.0, 1.0) * 255).astype(np.uint8)
+        return {**animation_data, "blendshapes": base64.b64encode(quantized.tobytes()).decode()}
+    
+    @classmethod
+    def send_animation_data_in_background(cls, animation_data: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Schedule send_animation_data without waiting for Unity"""
+        if len(cls._pending_sends) >= cls.MAX_PENDING_SENDS:
+            # Unity is not keeping up; newer frames will supersede this one
+            logger.warning("Too many pending Unity sends, dropping animation frame")
+            return None
+        
+        task = asyncio.create_task(cls.send_animation_data(animation_data))
+        cls._pending_sends.add(task)
+        task.add_done_callback(cls._pending_sends.discard)
+        return task
     
     @classmethod
     async def process_facial_animation(
@@ -139,95 +413,158 @@ class AnimationService:
         emotion: str = "neutral"
     ) -> Dict[str, float]:
         """Process facial animation using MediaPipe and return blendshape weights"""
-        if not cls._initialized or not cls._mediapipe_face_mesh:
-            return cls._get_default_blendshapes(emotion)
+        if not cls._initialized or not (cls._face_landmarker or cls._mediapipe_face_mesh):
+            return cls.blendshapes_from_weights(cls._get_default_blendshapes(emotion))
         
         try:
-            # Convert BGR to RGB
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            
-            # Process with MediaPipe
-            results = cls._mediapipe_face_mesh.process(rgb_image)
-            
-            if not results.multi_face_landmarks:
-                return cls._get_default_blendshapes(emotion)
-            
-            # Get face landmarks
-            face_landmarks = results.multi_face_landmarks[0]
+            # Inference runs every mediapipe_face_frame_interval frames and the last face is held in between;
+            # while no face is found, every frame is re-detected
+            blendshapes = cls._last_face_blendshapes
+            cls._face_frames_since_detection += 1
+            if blendshapes is None or cls._face_frames_since_detection >= settings.mediapipe_face_frame_interval:
+                cls._face_frames_since_detection = 0
+                blendshapes = cls._last_face_blendshapes = await asyncio.get_running_loop().run_in_executor(
+                    cls._inference_executor, cls._detect_blendshapes, image
+                )
             
-            # Calculate blendshape weights based on landmarks
-            blendshapes = cls._calculate_blendshapes_from_landmarks(face_landmarks)
+            if blendshapes is None:
+                return cls.blendshapes_from_weights(cls._get_default_blendshapes(emotion))
             
-            # Apply emotion overlay
-            emotion_blendshapes = cls._apply_emotion_overlay(blendshapes, emotion)
+            # Apply emotion overlay (to a copy, the detected frame may be held for the next ones)
+            emotion_blendshapes = cls._apply_emotion_overlay(blendshapes.copy(), emotion)
             
-            return emotion_blendshapes
+            return cls.blendshapes_from_weights(emotion_blendshapes)
             
         except Exception as e:
             logger.error(f"Facial animation processing failed: {e}")
-            return cls._get_default_blendshapes(emotion)
+            return cls.blendshapes_from_weights(cls._get_default_blendshapes(emotion))
+    
+    @classmethod
+    def _detect_blendshapes(cls, image: np.ndarray) -> Optional[np.ndarray]:
+        """Run face inference on a BGR frame and return blendshape weights, if a face was found"""
+        # Downsample first (keeping the aspect ratio, landmarks are normalized) so the color conversion
+        # touches a small frame, then convert BGR to RGB in place
+        height, width = image.shape[:2]
+        scale = cls.FACE_INPUT_SIZE / max(height, width)
+        if scale < 1:
+            rgb_image = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(rgb_image, cv2.COLOR_BGR2RGB, dst=rgb_image)
+        else:
+            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        
+        if cls._face_landmarker:
+            # The landmarker scores the blendshapes itself
+            return cls._detect_face_blendshapes(rgb_image)
+        
+        # Process with MediaPipe
+        results = cls._mediapipe_face_mesh.process(rgb_image)
+        
+        if not results.multi_face_landmarks:
+            return None
+        
+        # Calculate blendshape weights based on the first face's landmarks
+        return cls._calculate_blendshapes_from_landmarks(results.multi_face_landmarks[0])
+    
+    @classmethod
+    def _detect_face_blendshapes(cls, rgb_image: np.ndarray) -> Optional[np.ndarray]:
+        """Run the face landmarker on one video frame and return its blendshape scores, if a face was found"""
+        cls._face_timestamp_ms = max(cls._face_timestamp_ms + 1, int(time.monotonic() * 1000))
+        result = cls._face_landmarker.detect_for_video(
+            mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image),
+            cls._face_timestamp_ms
+        )
+        
+        if not result.face_blendshapes:
+            return None
+        
+        blendshapes = cls._BS_ZERO.copy()
+        for category in result.face_blendshapes[0]:
+            index = cls._FACE_BLENDSHAPE_INDEX.get(category.category_name)
+            if index is not None:
+                blendshapes[index] = category.score
+        return blendshapes
     
     @classmethod
     def _calculate_blendshapes_from_landmarks(
         cls,
         landmarks
-    ) -> Dict[str, float]:
+    ) -> np.ndarray:
         """Calculate blendshape weights from MediaPipe landmarks"""
-        blendshapes = {}
+        blendshapes = cls._BS_ZERO.copy()
+        index = cls._BS_INDEX
         
         # Extract key landmark points
-        points = np.array([[lm.x, lm.y, lm.z] for lm in landmarks.landmark])
+        points = cls._landmarks_to_points(landmarks)
         
         # Calculate basic facial expressions
-        # Eye blink detection
-        left_eye_height = cls._calculate_eye_height(points, "left")
-        right_eye_height = cls._calculate_eye_height(points, "right")
+        left_eye_height, right_eye_height, mouth_height = cls._calculate_feature_heights(points)
         
-        blendshapes["eyeBlink_L"] = max(0, 1 - left_eye_height / 0.1)
-        blendshapes["eyeBlink_R"] = max(0, 1 - right_eye_height / 0.1)
+        # Eye blink detection
+        blendshapes[index["eyeBlink_L"]] = max(0, 1 - left_eye_height / 0.1)
+        blendshapes[index["eyeBlink_R"]] = max(0, 1 - right_eye_height / 0.1)
         
         # Mouth open detection
-        mouth_height = cls._calculate_mouth_height(points)
-        blendshapes["jawOpen"] = min(1, mouth_height / 0.15)
+        blendshapes[index["jawOpen"]] = min(1, mouth_height / 0.15)
         
         # Smile detection
         smile_intensity = cls._calculate_smile_intensity(points)
-        blendshapes["mouthSmile_L"] = smile_intensity
-        blendshapes["mouthSmile_R"] = smile_intensity
-        
-        # Initialize other blendshapes to 0
-        for blendshape in cls.ARKIT_BLENDSHAPES:
-            if blendshape not in blendshapes:
-                blendshapes[blendshape] = 0.0
+        blendshapes[index["mouthSmile_L"]] = smile_intensity
+        blendshapes[index["mouthSmile_R"]] = smile_intensity
         
         return blendshapes
     
+    @classmethod
+    def _landmarks_to_points(cls, landmarks) -> np.ndarray:
+        """Landmark coordinates as an (N, 3) array, decoded in one pass from the protobuf's wire bytes"""
+        count = len(landmarks.landmark)
+        raw = landmarks.SerializeToString()
+        
+        if len(raw) == count * cls._LANDMARK_WIRE_DTYPE.itemsize:
+            entries = np.frombuffer(raw, dtype=cls._LANDMARK_WIRE_DTYPE)
+            if ((entries["tag"] == 0x0a) & (entries["size"] == 15) & (entries["x_tag"] == 0x0d)
+                    & (entries["y_tag"] == 0x15) & (entries["z_tag"] == 0x1d)).all():
+                points = np.empty((count, 3))
+                points[:, 0] = entries["x"]
+                points[:, 1] = entries["y"]
+                points[:, 2] = entries["z"]
+                return points
+        
+        # Landmarks carrying visibility/presence (or unset coordinates) have another layout
+        return np.array([[lm.x, lm.y, lm.z] for lm in landmarks.landmark])
+    
+    @classmethod
+    def _calculate_feature_heights(cls, points: np.ndarray) -> Tuple[float, float, float]:
+        """Calculate left eye, right eye and mouth heights in one gather and reduction"""
+        if len(points) <= cls._FEATURE_IDX_MAX:
+            # Partial landmark sets fall back to the per-feature helpers and their defaults
+            return (
+                cls._calculate_eye_height(points, "left"),
+                cls._calculate_eye_height(points, "right"),
+                cls._calculate_mouth_height(points)
+            )
+        
+        heights = points[cls._FEATURE_IDX, 1]
+        heights = np.maximum.reduceat(heights, cls._FEATURE_SEGMENTS) - np.minimum.reduceat(heights, cls._FEATURE_SEGMENTS)
+        left_eye_height, right_eye_height, mouth_height = heights.tolist()
+        return left_eye_height, right_eye_height, mouth_height
+    
     @classmethod
     def _calculate_eye_height(cls, points: np.ndarray, eye: str) -> float:
         """Calculate eye height for blink detection"""
         if eye == "left":
-            # Left eye landmarks (approximate indices)
-            eye_indices = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
+            eye_indices, max_index = cls._LEFT_EYE_IDX, cls._LEFT_EYE_IDX_MAX
         else:
-            # Right eye landmarks
-            eye_indices = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
+            eye_indices, max_index = cls._RIGHT_EYE_IDX, cls._RIGHT_EYE_IDX_MAX
         
-        if len(points) > max(eye_indices):
-            eye_points = points[eye_indices]
-            height = np.max(eye_points[:, 1]) - np.min(eye_points[:, 1])
-            return height
+        if len(points) > max_index:
+            return np.ptp(points[eye_indices, 1])
         return 0.1
     
     @classmethod
     def _calculate_mouth_height(cls, points: np.ndarray) -> float:
         """Calculate mouth height for jaw open detection"""
-        # Mouth landmarks (approximate indices)
-        mouth_indices = [13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32]
-        
-        if len(points) > max(mouth_indices):
-            mouth_points = points[mouth_indices]
-            height = np.max(mouth_points[:, 1]) - np.min(mouth_points[:, 1])
-            return height
+        if len(points) > cls._MOUTH_IDX_MAX:
+            return np.ptp(points[cls._MOUTH_IDX, 1])
         return 0.0
     
     @classmethod
@@ -238,11 +575,11 @@ class AnimationService:
         right_corner = 291
         
         if len(points) > max(left_corner, right_corner):
-            left_point = points[left_corner]
-            right_point = points[right_corner]
+            left_point = points[left_corner].tolist()
+            right_point = points[right_corner].tolist()
             
-            # Calculate distance between corners
-            distance = np.linalg.norm(left_point - right_point)
+            # Calculate distance between corners; scalar math beats np.linalg's dispatch for one 3-vector
+            distance = math.dist(left_point, right_point)
             
             # Normalize to 0-1 range (approximate)
             normalized_distance = min(1, distance / 0.3)
@@ -253,69 +590,20 @@ class AnimationService:
     @classmethod
     def _apply_emotion_overlay(
         cls,
-        blendshapes: Dict[str, float],
+        blendshapes: np.ndarray,
         emotion: str
-    ) -> Dict[str, float]:
+    ) -> np.ndarray:
         """Apply emotion-specific blendshape modifications"""
-        emotion_modifiers = {
-            "happy": {
-                "mouthSmile_L": 0.8,
-                "mouthSmile_R": 0.8,
-                "cheekSquint_L": 0.6,
-                "cheekSquint_R": 0.6,
-                "eyeWide_L": 0.3,
-                "eyeWide_R": 0.3
-            },
-            "sad": {
-                "mouthFrown_L": 0.7,
-                "mouthFrown_R": 0.7,
-                "browDown_L": 0.6,
-                "browDown_R": 0.6,
-                "eyeSquint_L": 0.4,
-                "eyeSquint_R": 0.4
-            },
-            "excited": {
-                "mouthSmile_L": 0.9,
-                "mouthSmile_R": 0.9,
-                "eyeWide_L": 0.8,
-                "eyeWide_R": 0.8,
-                "browInnerUp": 0.7,
-                "jawOpen": 0.3
-            },
-            "angry": {
-                "browDown_L": 0.8,
-                "browDown_R": 0.8,
-                "mouthFrown_L": 0.6,
-                "mouthFrown_R": 0.6,
-                "eyeSquint_L": 0.7,
-                "eyeSquint_R": 0.7
-            }
-        }
-        
-        if emotion in emotion_modifiers:
-            for blendshape, value in emotion_modifiers[emotion].items():
-                if blendshape in blendshapes:
-                    blendshapes[blendshape] = max(blendshapes[blendshape], value)
+        emotion_weights = cls._EMOTION_ARRAYS.get(emotion)
+        if emotion_weights is not None:
+            np.maximum(blendshapes, emotion_weights, out=blendshapes)
         
         return blendshapes
     
     @classmethod
-    def _get_default_blendshapes(cls, emotion: str) -> Dict[str, float]:
-        """Get default blendshape values for an emotion"""
-        blendshapes = {blendshape: 0.0 for blendshape in cls.ARKIT_BLENDSHAPES}
-        
-        # Apply basic emotion defaults
-        if emotion == "happy":
-            blendshapes["mouthSmile_L"] = 0.5
-            blendshapes["mouthSmile_R"] = 0.5
-        elif emotion == "sad":
-            blendshapes["mouthFrown_L"] = 0.5
-            blendshapes["mouthFrown_R"] = 0.5
-        elif emotion == "excited":
-            blendshapes["eyeWide_L"] = 0.3
-            blendshapes["eyeWide_R"] = 0.3
-        
-        return blendshapes
+    def _get_default_blendshapes(cls, emotion: str) -> np.ndarray:
+        """Get default blendshape values for an emotion (a shared, read-only array)"""
+        return cls._EMOTION_DEFAULTS.get(emotion, cls._EMOTION_DEFAULTS["neutral"])
     
     @classmethod
     async def create_gesture_animation(
@@ -324,33 +612,56 @@ class AnimationService:
         intensity: float = 1.0
     ) -> Dict[str, Any]:
         """Create gesture animation data"""
-        gesture_animations = {
-            "nod": {
-                "head_rotation_y": [0, 15, 0, -15, 0],
-                "duration": 1.0
-            },
-            "shake_head": {
-                "head_rotation_y": [0, -15, 0, 15, 0],
-                "duration": 1.0
-            },
-            "wave": {
-                "hand_rotation_z": [0, 45, -45, 45, 0],
-                "duration": 1.5
-            },
-            "point": {
-                "finger_extension": [0, 1, 1, 0],
-                "duration": 0.8
-            }
-        }
-        
-        if gesture_type in gesture_animations:
-            animation = gesture_animations[gesture_type].copy()
-            animation["intensity"] = intensity
-            animation["gesture_type"] = gesture_type
-            return animation
+        # One lookup in the prebuilt table; keyframes are shared tuples, so a shallow copy suffices
+        template = cls._GESTURE_ANIMATIONS.get(gesture_type)
+        if template is not None:
+            return {**template, "intensity": intensity, "gesture_type": gesture_type}
         
         return {"gesture_type": "unknown", "intensity": intensity}
     
+    @classmethod
+    def blendshapes_from_weights(cls, weights: Union[Sequence[float], np.ndarray]) -> Dict[str, float]:
+        """Name blendshape weights given in ARKIT_BLENDSHAPES order"""
+        if isinstance(weights, np.ndarray):
+            weights = weights.tolist()
+        return dict(zip(cls.ARKIT_BLENDSHAPES, weights))
+    
+    @classmethod
+    def merge_animation_updates(cls, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Coalesce animation updates: blendshapes last-wins, gestures concatenated, last emotion kept"""
+        # Weight arrays are full frames, so only the last one is expanded; named values after it apply on top
+        weights = None
+        overrides = {}
+        gestures = []
+        emotion = "neutral"
+        
+        for update in updates:
+            frame = update.get("blendshapes")
+            if isinstance(frame, dict):
+                overrides.update(frame)
+            elif frame is not None:
+                weights = frame
+                overrides = {}
+            gestures.extend(update.get("gestures") or [])
+            emotion = update.get("emotion", emotion)
+        
+        blendshapes = cls.blendshapes_from_weights(weights) if weights is not None else {}
+        blendshapes.update(overrides)
+        
+        return {"blendshapes": blendshapes, "gestures": gestures, "emotion": emotion}
+    
+    @classmethod
+    def finalize_animation(cls, animation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete animation data (e.g. from LLMService) for Unity in place and return it"""
+        animation_data["type"] = "animation_update"
+        animation_data["timestamp"] = asyncio.get_running_loop().time()
+        animation_data.setdefault("blendshapes", {})
+        animation_data.setdefault("emotion", "neutral")
+        animation_data.setdefault("gestures", [])
+        animation_data["fps"] = settings.animation_fps
+        
+        return animation_data
+    
     @classmethod
     async def create_complete_animation(
         cls,
@@ -361,7 +672,7 @@ class AnimationService:
         """Create complete animation data for Unity"""
         animation_data = {
             "type": "animation_update",
-            "timestamp": asyncio.get_event_loop().time(),
+            "timestamp": asyncio.get_running_loop().time(),
             "blendshapes": blendshapes,
             "emotion": emotion,
             "gestures": gestures or [],
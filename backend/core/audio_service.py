@@ -1,9 +1,11 @@
 import asyncio
+import json
 import logging
-import tempfile
-import os
-from typing import Optional, Dict, Any, BinaryIO
-import openai
+import io
+import shutil
+from typing import Optional, Dict, Any, BinaryIO, Tuple, Union
+import httpx
+from openai import AsyncOpenAI, NOT_GIVEN
 from elevenlabs import generate, save, set_api_key
 from elevenlabs.api import History
 import soundfile as sf
@@ -16,16 +18,32 @@ class AudioService:
     """Service for managing audio processing (STT and TTS)"""
     
     _initialized: bool = False
+    _openai_client: Optional[AsyncOpenAI] = None
+    # Set when the client runs on the app's shared HTTP client, which the app closes itself
+    _shares_http_client: bool = False
     _elevenlabs_voices: Dict[str, Any] = {}
     
+    # Emotion -> (voice settings, the same as compact JSON for the X-Voice-Settings header);
+    # any other emotion uses "neutral"
+    _VOICE_PROFILES: Dict[str, Tuple[Dict[str, float], str]] = {
+        emotion: (profile, json.dumps(profile, separators=(",", ":")))
+        for emotion, profile in {
+            "neutral": {"stability": 0.5, "similarity_boost": 0.75},
+            "excited": {"stability": 0.3, "similarity_boost": 0.9},
+            "calm": {"stability": 0.8, "similarity_boost": 0.6},
+            "sad": {"stability": 0.7, "similarity_boost": 0.8}
+        }.items()
+    }
+    
     @classmethod
-    async def initialize(cls):
-        """Initialize the audio service"""
+    async def initialize(cls, http_client: Optional[httpx.AsyncClient] = None):
+        """Initialize the audio service, optionally on a shared pooled HTTP client"""
         try:
             # Initialize OpenAI for Whisper
             if not settings.openai_api_key:
                 raise ValueError("OpenAI API key not configured")
-            openai.api_key = settings.openai_api_key
+            cls._openai_client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=http_client)
+            cls._shares_http_client = http_client is not None
             
             # Initialize ElevenLabs
             if not settings.elevenlabs_api_key:
@@ -45,6 +63,9 @@ class AudioService:
     @classmethod
     async def cleanup(cls):
         """Cleanup the audio service"""
+        if cls._openai_client and not cls._shares_http_client:
+            await cls._openai_client.close()
+        cls._openai_client = None
         cls._initialized = False
         cls._elevenlabs_voices.clear()
         logger.info("Audio service cleaned up")
@@ -74,7 +95,7 @@ class AudioService:
     @classmethod
     async def speech_to_text(
         cls,
-        audio_data: bytes,
+        audio_data: Union[bytes, BinaryIO],
         language: Optional[str] = None,
         prompt: Optional[str] = None
     ) -> Dict[str, Any]:
@@ -83,33 +104,22 @@ class AudioService:
             raise RuntimeError("Audio service not initialized")
         
         try:
-            # Create temporary file for audio
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # Upload straight from memory or the spooled upload; the name only tells Whisper the format
+            transcript = await cls._openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=("audio.wav", audio_data),
+                language=language or NOT_GIVEN,
+                prompt=prompt or NOT_GIVEN,
+                response_format="verbose_json"
+            )
+            
+            return {
+                "text": transcript.text,
+                "language": transcript.language,
+                "confidence": getattr(transcript, 'confidence', None),
+                "duration": getattr(transcript, 'duration', None)
+            }
             
-            try:
-                # Transcribe audio using Whisper
-                with open(temp_file_path, "rb") as audio_file:
-                    transcript = await asyncio.to_thread(
-                        openai.Audio.transcribe,
-                        "whisper-1",
-                        audio_file,
-                        language=language,
-                        prompt=prompt
-                    )
-                
-                return {
-                    "text": transcript.text,
-                    "language": transcript.language,
-                    "confidence": getattr(transcript, 'confidence', None),
-                    "duration": getattr(transcript, 'duration', None)
-                }
-                
-            finally:
-                # Clean up temporary file
-                os.unlink(temp_file_path)
-                
         except Exception as e:
             logger.error(f"Speech-to-text conversion failed: {e}")
             raise
@@ -160,63 +170,53 @@ class AudioService:
     async def process_audio_stream(
         cls,
         audio_stream: BinaryIO,
-        chunk_size: int = 1024
+        chunk_size: int = 64 * 1024
     ) -> bytes:
         """Process audio stream and return complete audio data"""
-        audio_chunks = []
-        
-        while True:
-            chunk = audio_stream.read(chunk_size)
-            if not chunk:
-                break
-            audio_chunks.append(chunk)
-        
-        return b''.join(audio_chunks)
+        # Copy in large chunks into one growing buffer instead of collecting and joining small reads
+        buffer = io.BytesIO()
+        shutil.copyfileobj(audio_stream, buffer, chunk_size)
+        return buffer.getvalue()
     
     @classmethod
     async def analyze_audio_emotion(
         cls,
-        audio_data: bytes
+        audio_data: Union[bytes, BinaryIO]
     ) -> Dict[str, Any]:
         """Analyze audio to detect emotional content"""
         try:
-            # Convert audio data to numpy array
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # soundfile decodes straight from a seekable file object, so no temp file copy is needed
+            if isinstance(audio_data, bytes):
+                audio_data = io.BytesIO(audio_data)
+            
+            # Load audio using soundfile
+            data, sample_rate = await asyncio.to_thread(sf.read, audio_data)
+            
+            # Basic audio analysis; the mean square is one dot product, with no squared copy of the samples
+            duration = len(data) / sample_rate
+            samples = data.ravel()
+            energy = np.dot(samples, samples) / samples.size
+            
+            # Simple emotion detection based on audio characteristics
+            emotion_data = {
+                "duration": duration,
+                "energy": float(energy),
+                "sample_rate": sample_rate,
+                "channels": len(data.shape),
+                "detected_emotion": "neutral"
+            }
+            
+            # Emotion classification based on energy and duration
+            if energy > 0.1:
+                if duration > 5:
+                    emotion_data["detected_emotion"] = "excited"
+                else:
+                    emotion_data["detected_emotion"] = "happy"
+            elif energy < 0.01:
+                emotion_data["detected_emotion"] = "calm"
+            
+            return emotion_data
             
-            try:
-                # Load audio using soundfile
-                data, sample_rate = await asyncio.to_thread(sf.read, temp_file_path)
-                
-                # Basic audio analysis
-                duration = len(data) / sample_rate
-                amplitude = np.abs(data)
-                energy = np.mean(amplitude ** 2)
-                
-                # Simple emotion detection based on audio characteristics
-                emotion_data = {
-                    "duration": duration,
-                    "energy": float(energy),
-                    "sample_rate": sample_rate,
-                    "channels": len(data.shape),
-                    "detected_emotion": "neutral"
-                }
-                
-                # Emotion classification based on energy and duration
-                if energy > 0.1:
-                    if duration > 5:
-                        emotion_data["detected_emotion"] = "excited"
-                    else:
-                        emotion_data["detected_emotion"] = "happy"
-                elif energy < 0.01:
-                    emotion_data["detected_emotion"] = "calm"
-                
-                return emotion_data
-                
-            finally:
-                os.unlink(temp_file_path)
-                
         except Exception as e:
             logger.error(f"Audio emotion analysis failed: {e}")
             return {
@@ -233,32 +233,19 @@ class AudioService:
     ) -> Dict[str, Any]:
         """Create audio response with emotion-appropriate voice settings"""
         # Adjust voice parameters based on emotion
-        stability = 0.5
-        similarity_boost = 0.75
-        
-        if emotion == "excited":
-            stability = 0.3
-            similarity_boost = 0.9
-        elif emotion == "calm":
-            stability = 0.8
-            similarity_boost = 0.6
-        elif emotion == "sad":
-            stability = 0.7
-            similarity_boost = 0.8
+        voice_settings, voice_settings_header = cls._VOICE_PROFILES.get(emotion, cls._VOICE_PROFILES["neutral"])
         
         # Generate audio
         audio_data = await cls.text_to_speech(
             text=text,
             voice_id=voice_id,
-            stability=stability,
-            similarity_boost=similarity_boost
+            stability=voice_settings["stability"],
+            similarity_boost=voice_settings["similarity_boost"]
         )
         
         return {
             "audio_data": audio_data,
             "emotion": emotion,
-            "voice_settings": {
-                "stability": stability,
-                "similarity_boost": similarity_boost
-            }
-        } 
\ No newline at end of file
+            "voice_settings": dict(voice_settings),
+            "voice_settings_header": voice_settings_header
+        }
\ No newline at end of file
@@ -1,10 +1,12 @@
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from typing import Optional
-import os
 
 class Settings(BaseSettings):
     """Application settings"""
     
+    # Read once at startup and never reassigned afterwards
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False, frozen=True)
+    
     # API Configuration
     api_title: str = "Virtual Human API"
     api_version: str = "1.0.0"
@@ -13,12 +15,15 @@ class Settings(BaseSettings):
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = 1  # the Unity connection (and chat history without Redis) is per-process
     
     # OpenAI Configuration
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-4o"
     openai_max_tokens: int = 1000
     openai_temperature: float = 0.7
+    openai_max_concurrent: int = 16  # completions in flight per worker
+    openai_tokens_per_minute: int = 0  # estimated prompt + completion token budget per worker; 0 disables it
     
     # ElevenLabs Configuration
     elevenlabs_api_key: Optional[str] = None
@@ -39,10 +44,17 @@ class Settings(BaseSettings):
     mediapipe_face_mesh: bool = True
     mediapipe_hands: bool = True
     mediapipe_pose: bool = False
+    # Path to a face_landmarker.task model; when set, faces go through the MediaPipe Tasks
+    # FaceLandmarker (GPU delegate where available) instead of the legacy Face Mesh
+    mediapipe_face_landmarker_model: Optional[str] = None
+    mediapipe_face_frame_interval: int = 1  # run face inference every Nth frame, holding the last face in between
     
     # Unity Communication
     unity_websocket_url: str = "ws://localhost:8080"
     unity_timeout: int = 30
+    # Send blendshapes to Unity as base64 uint8 weights (value * 255) in the order announced by a
+    # "blendshape_layout" message on connect, instead of a name -> float object per frame
+    unity_quantize_blendshapes: bool = False
     
     # Redis Configuration (for caching and queuing)
     redis_url: str = "redis://localhost:6379"
@@ -51,28 +63,6 @@ class Settings(BaseSettings):
     # Celery Configuration (for background tasks)
     celery_broker_url: str = "redis://localhost:6379/1"
     celery_result_backend: str = "redis://localhost:6379/2"
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
 
 # Global settings instance
-settings = Settings()
-
-# Load from environment variables
-def load_settings():
-    """Load settings from environment variables"""
-    settings.openai_api_key = os.getenv("OPENAI_API_KEY")
-    settings.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
-    settings.debug = os.getenv("DEBUG", "false").lower() == "true"
-    
-    # Override with environment variables if present
-    if os.getenv("OPENAI_MODEL"):
-        settings.openai_model = os.getenv("OPENAI_MODEL")
-    if os.getenv("ELEVENLABS_VOICE_ID"):
-        settings.elevenlabs_voice_id = os.getenv("ELEVENLABS_VOICE_ID")
-    if os.getenv("UNITY_WEBSOCKET_URL"):
-        settings.unity_websocket_url = os.getenv("UNITY_WEBSOCKET_URL")
-
-# Load settings on import
-load_settings() 
\ No newline at end of file
+settings = Settings()
\ No newline at end of file
@@ -1,50 +1,139 @@
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
+import httpx
+import orjson
+import redis.asyncio as redis
 from openai import AsyncOpenAI
 from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+class _TokenBucket:
+    """Tokens-per-minute budget that refills continuously"""
+    
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Waiters are served in arrival order
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, tokens: int):
+        """Wait until tokens are available, then take them"""
+        # A request bigger than the whole budget waits for a full bucket rather than forever
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
 class LLMService:
     """Service for managing LLM interactions"""
     
     _client: Optional[AsyncOpenAI] = None
-    _conversation_history: Dict[str, List[Dict[str, Any]]] = {}
+    # Completions are throttled before they reach OpenAI instead of being retried after a 429
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _token_bucket: Optional[_TokenBucket] = None
+    # Set when the client runs on the app's shared HTTP client, which the app closes itself
+    _shares_http_client: bool = False
+    # Per-session history, capped at the last MAX_HISTORY_MESSAGES messages to prevent memory issues;
+    # the last CONTEXT_MESSAGES of them go to the model
+    MAX_HISTORY_MESSAGES: int = 20
+    CONTEXT_MESSAGES: int = 10
+    # History is kept in Redis lists (one per session, expiring after HISTORY_TTL idle seconds) so all
+    # workers share it; the in-process deques are only used while Redis is unreachable
+    HISTORY_KEY_PREFIX: str = "vh:hist:"
+    HISTORY_TTL: int = 3600
+    _redis: Optional[redis.Redis] = None
+    _conversation_history: Dict[str, "deque[Dict[str, Any]]"] = {}
+    # Health probes reuse the last API check for HEALTH_CHECK_TTL seconds
+    HEALTH_CHECK_TTL: float = 30.0
+    _healthy_until: float = 0.0
+    _healthy_value: bool = False
+    
+    # Static persona; per-turn data stays out of it so the prompt prefix is identical across turns
+    _SYSTEM_PROMPT: str = "You are a helpful virtual human assistant."
+    
+    # Animation keyword -> trigger, matched as whole words in one scan of the response
+    _ANIMATION_KEYWORDS: Dict[str, str] = {
+        "happy": "happy", "great": "happy", "wonderful": "happy", "excellent": "happy",
+        "sad": "sad", "sorry": "sad", "unfortunate": "sad", "regret": "sad",
+        "excited": "excited", "amazing": "excited", "incredible": "excited",
+        "yes": "nod", "correct": "nod", "right": "nod",
+        "no": "shake_head", "incorrect": "shake_head", "wrong": "shake_head"
+    }
+    _ANIMATION_KEYWORD_RE = re.compile(r"\b(" + "|".join(_ANIMATION_KEYWORDS) + r")\b")
+    # Emotion triggers in priority order, with their facial expression
+    _EMOTION_EXPRESSIONS = (("happy", "smile"), ("sad", "frown"), ("excited", "wide_eyes"))
+    # Replies up to this length have their analysis memoized; short replies (greetings, confirmations) repeat
+    ANIMATION_CACHE_MAX_LENGTH: int = 2048
     
     @classmethod
-    async def initialize(cls):
-        """Initialize the LLM service"""
+    async def initialize(cls, http_client: Optional[httpx.AsyncClient] = None):
+        """Initialize the LLM service, optionally on a shared pooled HTTP client"""
         if not settings.openai_api_key:
             raise ValueError("OpenAI API key not configured")
         
-        cls._client = AsyncOpenAI(api_key=settings.openai_api_key)
+        cls._client = AsyncOpenAI(api_key=settings.openai_api_key, http_client=http_client)
+        cls._shares_http_client = http_client is not None
+        cls._semaphore = asyncio.Semaphore(settings.openai_max_concurrent)
+        cls._token_bucket = _TokenBucket(settings.openai_tokens_per_minute) if settings.openai_tokens_per_minute > 0 else None
+        cls._redis = await cls._connect_redis()
         logger.info("LLM service initialized successfully")
     
+    @classmethod
+    async def _connect_redis(cls) -> Optional[redis.Redis]:
+        """Connect to Redis for conversation history, or return None to keep it in process"""
+        client = redis.Redis.from_url(settings.redis_url, db=settings.redis_db, socket_connect_timeout=2)
+        try:
+            await client.ping()
+        except Exception as e:
+            logger.warning(f"Redis unavailable, keeping conversation history in process: {e}")
+            await client.aclose()
+            return None
+        return client
+    
     @classmethod
     async def cleanup(cls):
         """Cleanup the LLM service"""
-        if cls._client:
+        if cls._client and not cls._shares_http_client:
             await cls._client.close()
         cls._client = None
+        if cls._redis:
+            await cls._redis.aclose()
+            cls._redis = None
+        cls._healthy_until = 0.0
         logger.info("LLM service cleaned up")
     
     @classmethod
     async def is_healthy(cls) -> bool:
         """Check if the LLM service is healthy"""
+        if not cls._client:
+            return False
+        if time.monotonic() < cls._healthy_until:
+            return cls._healthy_value
         try:
-            if not cls._client:
-                return False
-            # Test with a simple completion
-            response = await cls._client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "Hello"}],
-                max_tokens=5
-            )
-            return bool(response.choices[0].message.content)
+            # Listing models is a free GET that still proves the key and the API are reachable
+            await cls._client.models.list()
+            healthy = True
         except Exception as e:
             logger.error(f"LLM health check failed: {e}")
-            return False
+            healthy = False
+        cls._healthy_value = healthy
+        cls._healthy_until = time.monotonic() + cls.HEALTH_CHECK_TTL
+        return healthy
     
     @classmethod
     async def generate_response(
@@ -61,22 +150,16 @@ class LLMService:
         
         try:
             # Build conversation history
-            messages = cls._build_messages(user_input, session_id, context, personality)
+            messages = await cls._build_messages(user_input, session_id, context, personality)
             
             # Generate response
-            response = await cls._client.chat.completions.create(
-                model=settings.openai_model,
-                messages=messages,
-                max_tokens=max_tokens or settings.openai_max_tokens,
-                temperature=settings.openai_temperature,
-                stream=False
-            )
+            response = await cls._create_completion(messages, max_tokens or settings.openai_max_tokens)
             
             # Extract response content
             response_content = response.choices[0].message.content
             
             # Update conversation history
-            cls._update_conversation_history(session_id, user_input, response_content)
+            await cls._update_conversation_history(session_id, user_input, response_content)
             
             # Analyze response for animation triggers
             animation_data = cls._analyze_response_for_animation(response_content)
@@ -85,7 +168,7 @@ class LLMService:
                 "response": response_content,
                 "animation": animation_data,
                 "session_id": session_id,
-                "timestamp": asyncio.get_event_loop().time()
+                "timestamp": time.monotonic()
             }
             
         except Exception as e:
@@ -93,7 +176,79 @@ class LLMService:
             raise
     
     @classmethod
-    def _build_messages(
+    async def stream_response(
+        cls,
+        user_input: str,
+        session_id: str,
+        context: Optional[str] = None,
+        personality: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as {"delta": text} chunks, then a final frame shaped like generate_response's result"""
+        if not cls._client:
+            raise RuntimeError("LLM service not initialized")
+        
+        try:
+            messages = await cls._build_messages(user_input, session_id, context, personality)
+            
+            # Chunks are forwarded as they arrive and collected for the history and animation analysis
+            parts: List[str] = []
+            async for delta in cls._stream_completion(messages, max_tokens or settings.openai_max_tokens):
+                parts.append(delta)
+                yield {"delta": delta}
+            
+            response_content = "".join(parts)
+            await cls._update_conversation_history(session_id, user_input, response_content)
+            
+            yield {
+                "response": response_content,
+                "animation": cls._analyze_response_for_animation(response_content),
+                "session_id": session_id,
+                "timestamp": time.monotonic()
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming LLM response: {e}")
+            raise
+    
+    @classmethod
+    async def _wait_for_token_budget(cls, messages: List[Dict[str, str]], max_tokens: int):
+        """Wait until the token budget covers a completion's estimated cost"""
+        if cls._token_bucket:
+            # Rough estimate: ~4 characters per prompt token, plus the whole completion allowance
+            await cls._token_bucket.acquire(sum(len(m["content"]) // 4 for m in messages) + max_tokens)
+    
+    @classmethod
+    async def _create_completion(cls, messages: List[Dict[str, str]], max_tokens: int):
+        """Call chat.completions.create within the concurrency and token budgets"""
+        await cls._wait_for_token_budget(messages, max_tokens)
+        async with cls._semaphore:
+            return await cls._client.chat.completions.create(
+                model=settings.openai_model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=settings.openai_temperature
+            )
+    
+    @classmethod
+    async def _stream_completion(cls, messages: List[Dict[str, str]], max_tokens: int) -> AsyncIterator[str]:
+        """Stream a completion's text chunks within the budgets, holding its concurrency slot until it ends"""
+        await cls._wait_for_token_budget(messages, max_tokens)
+        async with cls._semaphore:
+            stream = await cls._client.chat.completions.create(
+                model=settings.openai_model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=settings.openai_temperature,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+    
+    @classmethod
+    async def _build_messages(
         cls,
         user_input: str,
         session_id: str,
@@ -101,21 +256,21 @@ class LLMService:
         personality: Optional[str] = None
     ) -> List[Dict[str, str]]:
         """Build the message list for the LLM"""
-        messages = []
-        
-        # System message with personality and context
-        system_content = "You are a helpful virtual human assistant."
+        # System message with personality; context is left out so the provider's prompt cache
+        # keeps matching the system message and history prefix from turn to turn
+        system_content = cls._SYSTEM_PROMPT
         if personality:
             system_content += f" {personality}"
-        if context:
-            system_content += f" Context: {context}"
         
-        messages.append({"role": "system", "content": system_content})
+        messages = [{"role": "system", "content": system_content}]
         
-        # Add conversation history
-        if session_id in cls._conversation_history:
-            for msg in cls._conversation_history[session_id][-10:]:  # Last 10 messages
-                messages.append(msg)
+        # Add conversation history (last 10 messages), without the stored timestamps the API doesn't accept
+        for msg in await cls._load_history(session_id, cls.CONTEXT_MESSAGES):
+            messages.append({"role": msg["role"], "content": msg["content"]})
+        
+        # Per-turn context goes after the stable prefix, right before the input
+        if context:
+            messages.append({"role": "user", "content": f"Context: {context}"})
         
         # Add current user input
         messages.append({"role": "user", "content": user_input})
@@ -123,86 +278,155 @@ class LLMService:
         return messages
     
     @classmethod
-    def _update_conversation_history(
+    async def _load_history(cls, session_id: str, count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get a session's last count messages (all of them by default), oldest first"""
+        if cls._redis:
+            entries = await cls._redis.lrange(cls.HISTORY_KEY_PREFIX + session_id, -count if count else 0, -1)
+            return [orjson.loads(entry) for entry in entries]
+        
+        history = cls._conversation_history.get(session_id, ())
+        return list(islice(history, max(0, len(history) - count) if count else 0, None))
+    
+    @classmethod
+    async def _update_conversation_history(
         cls,
         session_id: str,
         user_input: str,
         assistant_response: str
     ):
         """Update the conversation history for a session"""
-        if session_id not in cls._conversation_history:
-            cls._conversation_history[session_id] = []
+        # Both messages of a turn are recorded together, so they share one timestamp;
+        # wall-clock time, since the history outlives this process
+        now = time.time()
+        user_message = {"role": "user", "content": user_input, "timestamp": now}
+        assistant_message = {"role": "assistant", "content": assistant_response, "timestamp": now}
         
-        # Add user message
-        cls._conversation_history[session_id].append({
-            "role": "user",
-            "content": user_input,
-            "timestamp": asyncio.get_event_loop().time()
-        })
+        if cls._redis:
+            key = cls.HISTORY_KEY_PREFIX + session_id
+            async with cls._redis.pipeline(transaction=False) as pipe:
+                pipe.rpush(key, orjson.dumps(user_message), orjson.dumps(assistant_message))
+                pipe.ltrim(key, -cls.MAX_HISTORY_MESSAGES, -1)
+                pipe.expire(key, cls.HISTORY_TTL)
+                await pipe.execute()
+            return
         
-        # Add assistant message
-        cls._conversation_history[session_id].append({
-            "role": "assistant",
-            "content": assistant_response,
-            "timestamp": asyncio.get_event_loop().time()
-        })
-        
-        # Keep only last 20 messages to prevent memory issues
-        if len(cls._conversation_history[session_id]) > 20:
-            cls._conversation_history[session_id] = cls._conversation_history[session_id][-20:]
+        history = cls._conversation_history.get(session_id)
+        if history is None:
+            # The deque drops the oldest messages itself once it is full
+            history = cls._conversation_history[session_id] = deque(maxlen=cls.MAX_HISTORY_MESSAGES)
+        history.append(user_message)
+        history.append(assistant_message)
     
     @classmethod
     def _analyze_response_for_animation(cls, response: str) -> Dict[str, Any]:
         """Analyze the response to determine animation triggers"""
-        animation_data = {
-            "emotion": "neutral",
-            "gestures": [],
-            "facial_expression": "neutral",
-            "speech_rate": "normal"
+        if len(response) <= cls.ANIMATION_CACHE_MAX_LENGTH:
+            emotion, facial_expression, gestures, speech_rate = cls._cached_animation_triggers(response)
+        else:
+            emotion, facial_expression, gestures, speech_rate = cls._detect_animation_triggers(response)
+        
+        # A fresh dict per call, callers complete it in place
+        return {
+            "emotion": emotion,
+            "gestures": list(gestures),
+            "facial_expression": facial_expression,
+            "speech_rate": speech_rate
         }
+    
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _cached_animation_triggers(cls, response: str) -> Tuple[str, str, Tuple[str, ...], str]:
+        """Memoized _detect_animation_triggers"""
+        return cls._detect_animation_triggers(response)
+    
+    @classmethod
+    def _detect_animation_triggers(cls, response: str) -> Tuple[str, str, Tuple[str, ...], str]:
+        """Detect emotion, facial expression, gestures and speech rate from the response"""
+        emotion = "neutral"
+        facial_expression = "neutral"
+        gestures = []
+        speech_rate = "normal"
         
-        # Simple emotion detection based on keywords
-        response_lower = response.lower()
+        # Simple keyword-based detection, one pass over the response
+        triggers = {cls._ANIMATION_KEYWORDS[word] for word in cls._ANIMATION_KEYWORD_RE.findall(response.lower())}
         
         # Emotion detection
-        if any(word in response_lower for word in ["happy", "great", "wonderful", "excellent"]):
-            animation_data["emotion"] = "happy"
-            animation_data["facial_expression"] = "smile"
-        elif any(word in response_lower for word in ["sad", "sorry", "unfortunate", "regret"]):
-            animation_data["emotion"] = "sad"
-            animation_data["facial_expression"] = "frown"
-        elif any(word in response_lower for word in ["excited", "amazing", "incredible"]):
-            animation_data["emotion"] = "excited"
-            animation_data["facial_expression"] = "wide_eyes"
+        for candidate, expression in cls._EMOTION_EXPRESSIONS:
+            if candidate in triggers:
+                emotion = candidate
+                facial_expression = expression
+                break
         
         # Gesture detection
         if "?" in response:
-            animation_data["gestures"].append("question_gesture")
-        if any(word in response_lower for word in ["yes", "correct", "right"]):
-            animation_data["gestures"].append("nod")
-        if any(word in response_lower for word in ["no", "incorrect", "wrong"]):
-            animation_data["gestures"].append("shake_head")
+            gestures.append("question_gesture")
+        if "nod" in triggers:
+            gestures.append("nod")
+        if "shake_head" in triggers:
+            gestures.append("shake_head")
         
         # Speech rate detection
-        if len(response.split()) > 50:
-            animation_data["speech_rate"] = "fast"
-        elif len(response.split()) < 10:
-            animation_data["speech_rate"] = "slow"
+        word_count = len(response.split())
+        if word_count > 50:
+            speech_rate = "fast"
+        elif word_count < 10:
+            speech_rate = "slow"
         
-        return animation_data
+        return emotion, facial_expression, tuple(gestures), speech_rate
     
     @classmethod
-    def get_conversation_history(cls, session_id: str) -> List[Dict[str, Any]]:
+    async def get_conversation_history(cls, session_id: str) -> List[Dict[str, Any]]:
         """Get conversation history for a session"""
-        return cls._conversation_history.get(session_id, [])
+        return await cls._load_history(session_id)
     
     @classmethod
-    def clear_conversation_history(cls, session_id: str):
+    async def clear_conversation_history(cls, session_id: str):
         """Clear conversation history for a session"""
-        if session_id in cls._conversation_history:
-            del cls._conversation_history[session_id]
+        if cls._redis:
+            await cls._redis.delete(cls.HISTORY_KEY_PREFIX + session_id)
+        else:
+            cls._conversation_history.pop(session_id, None)
+    
+    @classmethod
+    async def get_session_summaries(cls) -> List[Dict[str, Any]]:
+        """Summarize every non-empty session in one pass"""
+        if not cls._redis:
+            return [
+                {
+                    "session_id": session_id,
+                    "message_count": len(history),
+                    "created_at": history[0]["timestamp"],
+                    "last_activity": history[-1]["timestamp"]
+                }
+                for session_id, history in cls._conversation_history.items()
+                if history
+            ]
+        
+        # One round trip for the first message, last message and length of every session
+        keys = [key async for key in cls._redis.scan_iter(match=cls.HISTORY_KEY_PREFIX + "*", count=1000)]
+        async with cls._redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.lindex(key, 0)
+                pipe.lindex(key, -1)
+                pipe.llen(key)
+            replies = await pipe.execute()
+        
+        summaries = []
+        for index, key in enumerate(keys):
+            first, last, count = replies[3 * index:3 * index + 3]
+            if count:
+                summaries.append({
+                    "session_id": key[len(cls.HISTORY_KEY_PREFIX):].decode(),
+                    "message_count": count,
+                    "created_at": orjson.loads(first)["timestamp"],
+                    "last_activity": orjson.loads(last)["timestamp"]
+                })
+        return summaries
     
     @classmethod
-    def get_all_session_ids(cls) -> List[str]:
+    async def get_all_session_ids(cls) -> List[str]:
         """Get all active session IDs"""
-        return list(cls._conversation_history.keys()) 
\ No newline at end of file
+        if cls._redis:
+            prefix_length = len(cls.HISTORY_KEY_PREFIX)
+            return [key[prefix_length:].decode() async for key in cls._redis.scan_iter(match=cls.HISTORY_KEY_PREFIX + "*", count=1000)]
+        return list(cls._conversation_history.keys())
\ No newline at end of file
@@ -6,9 +6,13 @@ import json
 import logging
 from typing import Dict, List, Optional
 import os
+import sys
+import httpx
 from dotenv import load_dotenv
 
 from api.routes import chat, audio, animation, avatar
+from api.responses import ORJSONResponse
+from api.websocket import MAX_FRAME_SIZE
 from core.config import settings
 from core.llm_service import LLMService
 from core.audio_service import AudioService
@@ -24,7 +28,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="Virtual Human API",
     description="AI-powered virtual human system with real-time speech and animation",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -47,10 +52,17 @@ async def startup_event():
     """Initialize services on startup"""
     logger.info("Starting Virtual Human API...")
     
+    # One pooled HTTP/2 client for outbound API calls, so requests reuse connections instead of re-handshaking TLS
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        timeout=httpx.Timeout(30.0)
+    )
+    
     # Initialize core services
     try:
-        await LLMService.initialize()
-        await AudioService.initialize()
+        await LLMService.initialize(http_client=app.state.http)
+        await AudioService.initialize(http_client=app.state.http)
         await AnimationService.initialize()
         logger.info("All services initialized successfully")
     except Exception as e:
@@ -67,6 +79,7 @@ async def shutdown_event():
         await LLMService.cleanup()
         await AudioService.cleanup()
         await AnimationService.cleanup()
+        await app.state.http.aclose()
         logger.info("All services cleaned up successfully")
     except Exception as e:
         logger.error(f"Error during cleanup: {e}")
@@ -80,18 +93,45 @@ async def root():
         "status": "running"
     }
 
+# Per-check cap, so one stuck dependency can't hold up liveness probes
+HEALTH_CHECK_TIMEOUT = 2.0
+
+async def _check_health(check) -> bool:
+    """Run one service health check, treating a timeout or error as unhealthy"""
+    try:
+        return await asyncio.wait_for(check, HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        logger.warning(f"Health check failed: {e!r}")
+        return False
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    # The checks are independent, so the endpoint waits for the slowest one rather than their sum
+    llm_ok, audio_ok, animation_ok = await asyncio.gather(
+        _check_health(LLMService.is_healthy()),
+        _check_health(AudioService.is_healthy()),
+        _check_health(AnimationService.is_healthy())
+    )
     return {
         "status": "healthy",
         "services": {
-            "llm": await LLMService.is_healthy(),
-            "audio": await AudioService.is_healthy(),
-            "animation": await AnimationService.is_healthy()
+            "llm": llm_ok,
+            "audio": audio_ok,
+            "animation": animation_ok
         }
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(
+        "main:app",  # an import string, so uvicorn can spawn worker processes
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",  # uvloop has no Windows build
+        http="httptools",
+        ws="websockets",
+        ws_max_size=MAX_FRAME_SIZE,
+        backlog=2048
+    ) 
\ No newline at end of file
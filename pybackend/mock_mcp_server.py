@@ -4,11 +4,13 @@ Simple mock MCP server for testing
 """
 
 import asyncio
-import json
+import os
 import sys
 import signal
 from typing import Any, Dict
 
+import orjson
+
 class MockMCPServer:
     def __init__(self):
         self.tools = [
@@ -102,61 +104,76 @@ class MockMCPServer:
                 }
             }
     
+    def write_message(self, message: Dict[str, Any]):
+        """Write one newline-delimited JSON message to stdout"""
+        sys.stdout.buffer.write(orjson.dumps(message) + b"\n")
+        sys.stdout.buffer.flush()
+    
+    async def handle_line(self, line: bytes):
+        """Parse, handle and answer one request line"""
+        try:
+            # Parse JSON request
+            request = orjson.loads(line)
+            
+            # Handle the request
+            response = await self.handle_request(request)
+            
+            # Send response
+            self.write_message(response)
+            
+        except orjson.JSONDecodeError as e:
+            # Send error response for invalid JSON
+            error_response = {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "error": {
+                    "code": -32700,
+                    "message": f"Parse error: {str(e)}"
+                }
+            }
+            self.write_message(error_response)
+            
+        except Exception as e:
+            # Send error response for other errors
+            error_response = {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "error": {
+                    "code": -32603,
+                    "message": f"Internal error: {str(e)}"
+                }
+            }
+            self.write_message(error_response)
+    
     async def run(self):
         """Run the MCP server"""
         # Set up signal handlers for graceful shutdown
         def signal_handler(signum, frame):
-            sys.exit(0)
+            # Exit at once: a clean shutdown would wait forever on the thread blocked reading stdin
+            os._exit(0)
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
+        # Requests in flight; each one answers on its own as soon as it is handled
+        pending = set()
         try:
             while True:
-                try:
-                    # Read line from stdin
-                    line = sys.stdin.readline()
-                    if not line:
-                        break
-                    
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # Parse JSON request
-                    request = json.loads(line)
-                    
-                    # Handle the request
-                    response = await self.handle_request(request)
-                    
-                    # Send response
-                    print(json.dumps(response), flush=True)
-                    
-                except json.JSONDecodeError as e:
-                    # Send error response for invalid JSON
-                    error_response = {
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "error": {
-                            "code": -32700,
-                            "message": f"Parse error: {str(e)}"
-                        }
-                    }
-                    print(json.dumps(error_response), flush=True)
-                    continue
-                    
-                except Exception as e:
-                    # Send error response for other errors
-                    error_response = {
-                        "jsonrpc": "2.0",
-                        "id": 1,
-                        "error": {
-                            "code": -32603,
-                            "message": f"Internal error: {str(e)}"
-                        }
-                    }
-                    print(json.dumps(error_response), flush=True)
+                # Read line from stdin off the event loop so running requests keep going
+                line = await asyncio.to_thread(sys.stdin.buffer.readline)
+                if not line:
+                    break
+                
+                line = line.strip()
+                if not line:
                     continue
+                
+                task = asyncio.create_task(self.handle_line(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            
+            if pending:
+                await asyncio.gather(*pending)
                     
         except KeyboardInterrupt:
             pass
@@ -170,7 +187,7 @@ class MockMCPServer:
                     "message": f"Server error: {str(e)}"
                 }
             }
-            print(json.dumps(error_response), flush=True)
+            self.write_message(error_response)
 
 if __name__ == "__main__":
     server = MockMCPServer()
@@ -3,11 +3,12 @@
 Mock Weather MCP Server for testing purposes
 """
 
-import json
 import sys
 import asyncio
 from typing import Any, Dict, List
 
+import orjson
+
 class MockWeatherMCPServer:
     def __init__(self):
         self.weather_data = {
@@ -99,31 +100,47 @@ class MockWeatherMCPServer:
             }
         }
 
+def write_message(message: Dict[str, Any]):
+    """Write one newline-delimited JSON message to stdout"""
+    sys.stdout.buffer.write(orjson.dumps(message) + b"\n")
+    sys.stdout.buffer.flush()
+
+async def handle_line(server: MockWeatherMCPServer, line: bytes):
+    """Parse, handle and answer one request line"""
+    request = None
+    try:
+        request = orjson.loads(line)
+        response = await server.handle_request(request)
+        write_message(response)
+        
+    except Exception as e:
+        error_response = {
+            "jsonrpc": "2.0",
+            "id": request.get("id") if isinstance(request, dict) else None,
+            "error": {
+                "code": -32603,
+                "message": f"Internal error: {str(e)}"
+            }
+        }
+        write_message(error_response)
+
 async def main():
     server = MockWeatherMCPServer()
+    # Requests in flight; each one answers on its own as soon as it is handled
+    pending = set()
     
     while True:
-        try:
-            line = sys.stdin.readline()
-            if not line:
-                break
-                
-            request = json.loads(line.strip())
-            response = await server.handle_request(request)
-            print(json.dumps(response))
-            sys.stdout.flush()
-            
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": request.get("id") if 'request' in locals() else None,
-                "error": {
-                    "code": -32603,
-                    "message": f"Internal error: {str(e)}"
-                }
-            }
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+        # Read off the event loop so requests already running keep going
+        line = await asyncio.to_thread(sys.stdin.buffer.readline)
+        if not line:
+            break
+        
+        task = asyncio.create_task(handle_line(server, line))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    if pending:
+        await asyncio.gather(*pending)
 
 if __name__ == "__main__":
     asyncio.run(main())
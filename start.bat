@@ -4,7 +4,7 @@ echo.
 
 echo [1/3] Starting Backend Server...
 cd backend
-start "Virtual Human Backend" cmd /k "python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000"
+start "Virtual Human Backend" cmd /k "python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000 --http httptools --ws websockets"
 timeout /t 3 /nobreak >nul
 
 echo [2/3] Starting Frontend...
@@ -101,7 +101,7 @@ public class WebSocketManager : MonoBehaviour
         try
         {
             var buffer = Encoding.UTF8.GetBytes(message);
-            await webSocket.SendAsync(new ArraySegment<byte>(buffer), WebSocketMessageType.Text, true, cancellationTokenSource.Token);
+            await webSocket.SendAsync(new ArraySegment<byte>(buffer), WebSocketMessageType.Binary, true, cancellationTokenSource.Token);
         }
         catch (Exception e)
         {
@@ -120,7 +120,7 @@ public class WebSocketManager : MonoBehaviour
             {
                 var result = await webSocket.ReceiveAsync(new ArraySegment<byte>(buffer), cancellationTokenSource.Token);
                 
-                if (result.MessageType == WebSocketMessageType.Text)
+                if (result.MessageType == WebSocketMessageType.Text || result.MessageType == WebSocketMessageType.Binary)
                 {
                     var message = Encoding.UTF8.GetString(buffer, 0, result.Count);
                     OnMessageReceived?.Invoke(message);